@@ -0,0 +1,163 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Frame animation of graphics resource states.
+'''
+
+LOOP = 'loop'
+ONCE = 'once'
+PING_PONG = 'ping-pong'
+
+
+class AnimationClip(object):
+  """
+  Sequence of resource states shown one after another for C{frame_length}
+  time units each. The frame shown at a given time is computed directly
+  (see C{L{index}}), so the cost does not depend on number of frames or
+  their length.
+
+  Clips are played in one of three modes: C{LOOP} (restart after the last
+  frame), C{ONCE} (stop after the last frame and call C{on_complete}) and
+  C{PING_PONG} (play forward and backward by turns).
+
+  @type states: C{list}
+  @ivar states: Names of states in order of display.
+
+  @type frame_length: number
+  @ivar frame_length: Time each frame is shown for.
+
+  @type length: number
+  @ivar length: Time of one pass through the clip (in C{LOOP} and C{ONCE}
+    modes). Frames which do not fit in it are never shown.
+
+  @type mode: C{str}
+  @ivar mode: C{LOOP}, C{ONCE} or C{PING_PONG}.
+
+  @type on_complete: callable or None
+  @ivar on_complete: Called without arguments when a C{ONCE} clip ends.
+
+  @type time: number
+  @ivar time: Current time of the clip.
+
+  @type frame: C{int} or None
+  @ivar frame: Index of the frame returned last by C{L{seek}}, None if no
+    frame was returned yet.
+
+  @type done: C{bool}
+  @ivar done: Tells whether a C{ONCE} clip has ended.
+  """
+
+  def __init__(self, states, frame_length = None, period = None,
+               mode = LOOP, on_complete = None):
+    """
+    @type  states: sequence
+    @param states: Names of states in order of display.
+
+    @type  frame_length: number
+    @param frame_length: Time each frame is shown for. Defaults to
+      C{period} divided by number of states.
+
+    @type  period: number
+    @param period: Time of one pass through the clip. Defaults to
+      C{frame_length} times number of states.
+    """
+
+    if frame_length is None and period is None:
+      raise ValueError('Either frame_length or period is required')
+
+    self.states = list(states)
+    n = len(self.states)
+
+    if frame_length is None:
+      frame_length = period / n if n else 0
+    if period is None:
+      period = frame_length * n
+
+    self.frame_length = frame_length
+    self.length = period
+    self.mode = mode
+    self.on_complete = on_complete
+
+    self.rewind()
+
+  @classmethod
+  def from_resource(cls, res, frame_count = None, prefix = 'frame', **kw):
+    """
+    Create clip of states C{prefix + '0'}, C{prefix + '1'}, ... of
+    resource C{res} (as returned by C{GfxManager.get}). Other keyword
+    arguments are passed to the constructor.
+
+    @type  frame_count: C{int}
+    @param frame_count: Number of states used, defaults to number of states
+      of the resource.
+    """
+
+    if frame_count is None:
+      frame_count = len(res['states'])
+    return cls([prefix + str(i) for i in xrange(frame_count)], **kw)
+
+  def rewind(self):
+    """
+    Restart the clip.
+    """
+
+    self.time = 0
+    self.frame = None
+    self.done = False
+
+  def index(self, time):
+    """
+    Return index of frame shown at C{time} or None if no frame is shown
+    (time is out of the clip or the clip has no length).
+    """
+
+    n = len(self.states)
+    if self.frame_length <= 0 or n == 0 or time < 0:
+      return None
+
+    if self.mode == LOOP:
+      if self.length <= 0:
+        return None
+      time %= self.length
+
+    i = int(time // self.frame_length)
+    if self.mode == PING_PONG and n > 1:
+      i %= 2 * n - 2
+      if i >= n:
+        i = 2 * n - 2 - i
+
+    return i if i < n else None
+
+  def seek(self, time):
+    """
+    Move to C{time}. Return name of the state to show if the frame changed,
+    None otherwise. A C{ONCE} clip moved past its end is marked C{done}
+    and its C{on_complete} is called (once).
+    """
+
+    self.time = time
+    if self.done:
+      return None
+
+    if self.mode == ONCE and time >= self.length:
+      self.done = True
+      if self.on_complete is not None:
+        self.on_complete()
+      return None
+
+    i = self.index(time)
+    if i is None or i == self.frame:
+      return None
+
+    self.frame = i
+    return self.states[i]
+
+  def step(self, dt):
+    """
+    Return result of C{L{seek}} to the current time and then advance the
+    time by C{dt}.
+    """
+
+    state = self.seek(self.time)
+    self.time += dt
+    return state
@@ -20,15 +20,36 @@ Main Agrajag application class with helper classes.
 @var  _stg: Dynamically created from C{L{_here}} pathname to XML files
   describing game levels.
 
+@type _atlas: C{str}
+@var  _atlas: Dynamically created from C{L{_here}} pathname to the texture
+  atlas placement table (see C{L{atlas}}). Atlas is used only if the table
+  exists.
+
+@type _cache: C{str}
+@var  _cache: Dynamically created from C{L{_here}} pathname to the compiled
+  content cache (see C{L{contentcache.ContentCache}}).
+
+@type _profile: C{str}
+@var  _profile: Dynamically created from C{L{_here}} pathname to the default
+  startup profile report (see C{L{profiler.StartupProfiler}}).
+
+@type options: C{argparse.Namespace}
+@var  options: Command line options (see C{L{_parse_args}}).
+
 @type app: C{L{AGApplication}}
 @var  app: Globally accessible reference to the singleton C{L{AGApplication}}
   instance. Intended to supply information such as screen size, etc. in various
   places throughout the program where it wouldn't be accessible otherwise.
+  Created by C{L{bootstrap}}.
 '''
 
 
 import os
 import sys
+import time
+import argparse
+import multiprocessing
+import multiprocessing.pool
 
 import pygame
 from pygame.color import Color
@@ -37,22 +58,95 @@ import random
 import singleton
 
 import clock
+import atlas
+import contentcache
+from profiler import StartupProfiler
+from pool import ObjectPool
+from projectiles import ProjectileStore
+from moverbatch import MoverBatch
+from registry import Registry
 import dbmanager as dbm
 import gfxmanager as gfxm
 import stagemanager as stgm
 import groupmanager as grpm
+import collision
 import eventmanager as evm
 import hud
+import widgets
 
 
 _here = os.path.dirname(__file__)
 _gfx  = os.path.join(_here, './gfx')
 _db   = os.path.join(_here, './db')
 _stg  = os.path.join(_here, './stages')
+_atlas = os.path.join(_gfx, atlas.ATLAS_DIR, atlas.TABLE_FILE)
+_cache = os.path.join(_here, './content.cache')
+_profile = os.path.join(_here, './startup-profile.json')
 
 import logging
 LOGFILE = os.path.join(_here,'agrajag.log')
 logging.basicConfig(filename=LOGFILE, level=logging.DEBUG)
+log = logging.getLogger('AGApplication')
+
+
+def _parse_args(argv):
+  '''Parse command line arguments. Unknown arguments are ignored.'''
+
+  parser = argparse.ArgumentParser(description='Agrajag, 2d shooter game')
+  parser.add_argument('level', nargs='?', default=None,
+                      help='name of the level to play')
+  parser.add_argument('--parallel-import', action='store_true',
+                      help='parse XML files and decode images in parallel')
+  parser.add_argument('--import-workers', type=int, default=None,
+                      metavar='N',
+                      help='number of parallel import workers '
+                           '(default: number of CPUs)')
+  parser.add_argument('--lazy-gfx', action='store_true',
+                      help='load graphics of game classes on first use')
+  parser.add_argument('--gfx-budget', type=float, default=None,
+                      metavar='MB',
+                      help='maximal size of decoded graphics in lazy mode')
+  parser.add_argument('--profile-startup', action='store_true',
+                      help='time startup phases and report them')
+  parser.add_argument('--profile-output', default=_profile, metavar='FILE',
+                      help='file the startup profile report is written to '
+                           '(default: %s)' % os.path.basename(_profile))
+  parser.add_argument('--pool-size', type=int, default=None, metavar='N',
+                      help='number of killed projectiles, explosions and '
+                           'beams of each class kept for reuse, unless set '
+                           'by the class (default: %d)' %
+                           ObjectPool.default_size)
+  parser.add_argument('--headless', action='store_true',
+                      help='simulate the level without display as fast as '
+                           'possible and report simulation speed')
+  parser.add_argument('--sim-duration', type=float, default=60.,
+                      metavar='SECONDS',
+                      help='stage time simulated in headless mode '
+                           '(default: %(default)s)')
+  parser.add_argument('--sim-frame-span', type=int, default=None,
+                      metavar='MS',
+                      help='length of a simulated frame in headless mode '
+                           '(default: 1000 / fps)')
+  parser.add_argument('--pixel-perfect', action='store_true',
+                      help='test collisions of overlapping sprites against '
+                           'their images\' masks instead of rects only')
+  parser.add_argument('--numpy-projectiles', action='store_true',
+                      help='move projectiles flying in straight lines with '
+                           'vectorized NumPy operations (requires NumPy)')
+  parser.add_argument('--numpy-movers', action='store_true',
+                      help='update movers of the same class together with '
+                           'vectorized NumPy operations (requires NumPy)')
+  parser.add_argument('--tick-rate', type=int, default=None, metavar='HZ',
+                      help='advance game logic in fixed ticks of this rate '
+                           'and interpolate drawn positions between them '
+                           '(default: once per frame)')
+  parser.add_argument('--max-ticks', type=int, default=5, metavar='N',
+                      help='maximal number of ticks run per frame to catch '
+                           'up with slow frames (default: %(default)s)')
+
+  return parser.parse_known_args(argv)[0]
+
+options = _parse_args(sys.argv[1:])
 
 # abstract class
 class AGStage(object):
@@ -118,7 +212,8 @@ class AGMenu(AGStage):
 
   def frame_start(self):
       app.screen.fill(Color('black'))
-      app.screen.blit(self.gfx['background']['image'], (0, 0))
+      app.screen.blit(self.gfx['background']['image'], (0, 0),
+                      self.gfx['background']['areas']['default'])
       app.screen.blit(self.gfx['main_options']['image'], (450, 0),
                       (self.gfx['main_options']['states']['play']['x_off'],
                        self.gfx['main_options']['states']['play']['y_off'],
@@ -193,6 +288,31 @@ class AGApplication(singleton.Singleton):
 
      @type clock: C{L{clock.Clock}}
      @ivar clock: Main game clock instance (only instance allowed to C{tick}).
+
+     @type parallel_import: C{bool}
+     @ivar parallel_import: Flag determining whether game content is imported
+       in parallel (XML files parsed by a process pool, images decoded by
+       a thread pool).
+
+     @type import_times: C{dict}
+     @ivar import_times: Wall-clock time (in seconds) spent in each content
+       import phase.
+
+     @type headless: C{bool}
+     @ivar headless: Flag determining whether the application runs without
+       a real display, driven by a synthetic clock (see C{L{simulate}}).
+
+     @type pixel_perfect: C{bool}
+     @ivar pixel_perfect: Flag determining whether collisions are tested
+       against sprite masks (see C{L{collision.CollisionPhase}}).
+
+     @type numpy_projectiles: C{bool}
+     @ivar numpy_projectiles: Flag determining whether projectiles are moved
+       by C{L{ProjectileStore}}.
+
+     @type numpy_movers: C{bool}
+     @ivar numpy_movers: Flag determining whether movers are updated by
+       C{L{MoverBatch}}.
   '''
   def __init__(self, size=(800, 600), fps=40, fullscreen=False):
     '''Initialize the singleton or raise exception if its instance exists.
@@ -200,30 +320,91 @@ class AGApplication(singleton.Singleton):
     '''
     super(AGApplication, self).__init__()
 
-    pygame.init()
+    StartupProfiler.enabled = options.profile_startup
+    with StartupProfiler.measure('total', 'bootstrap'):
+      self.__bootstrap(size, fps, fullscreen)
+
+    if StartupProfiler.enabled:
+      report = StartupProfiler.report()
+      log.info('startup profile:\n%s' % report)
+      print report
+      StartupProfiler.dump(options.profile_output)
+
+  def __bootstrap(self, size, fps, fullscreen):
+    '''Initialize display, import game content and build the main menu.
+    '''
+
+    self.parallel_import = options.parallel_import
+    self.import_times = {}
+    self.headless = options.headless
+    self.pixel_perfect = options.pixel_perfect
+
+    self.numpy_projectiles = options.numpy_projectiles
+    if self.numpy_projectiles and not ProjectileStore.available():
+      log.warning('NumPy is not installed, projectiles are updated one by one')
+      self.numpy_projectiles = False
+
+    self.numpy_movers = options.numpy_movers
+    if self.numpy_movers and not MoverBatch.available():
+      log.warning('NumPy is not installed, movers are updated one by one')
+      self.numpy_movers = False
+
+    if self.headless:
+      os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+    # worker processes are forked before the display is initialized
+    xml_pool = None
+    if self.parallel_import:
+      xml_pool = multiprocessing.Pool(options.import_workers)
+
+    try:
+      self.__init_display(size, fps, fullscreen)
+
+      self.clock = clock.Clock(readonly = False)
+
+      if options.pool_size is not None:
+        ObjectPool.default_size = options.pool_size
+      if self.headless:
+        self.clock.set_synthetic(options.sim_frame_span or 1000 // self.fps)
+      if options.tick_rate is not None:
+        self.clock.set_tick_rate(options.tick_rate, options.max_ticks)
+
+      self.__init_managers(xml_pool)
+    finally:
+      if xml_pool is not None:
+        xml_pool.close()
+        xml_pool.join()
+
+    with StartupProfiler.measure('phase', 'hud font'):
+      widgets.load_font(*widgets.LABEL_FONT)
+
+    with StartupProfiler.measure('phase', 'menu'):
+      self.menu = AGMenu()
+
+  def __init_display(self, size, fps, fullscreen):
+    '''Initialize pygame and open the game window.
+    '''
+
+    with StartupProfiler.measure('phase', 'pygame.init'):
+      pygame.init()
     random.seed()
 
     self.screen_size = size
     self.fps = fps
     self.fullscreen = fullscreen
 
-    if self.fullscreen:
-      self.screen = pygame.display.set_mode(self.screen_size,
-                                            pygame.constants.FULLSCREEN)
-    else:
-      self.screen = pygame.display.set_mode(self.screen_size)
+    with StartupProfiler.measure('phase', 'set_mode'):
+      if self.fullscreen:
+        self.screen = pygame.display.set_mode(self.screen_size,
+                                              pygame.constants.FULLSCREEN)
+      else:
+        self.screen = pygame.display.set_mode(self.screen_size)
     self.screen.fill(Color('black'))
 
     self.title = 'Agrajag, 2d shooter game'
     self.short_title = 'Agrajag'
     pygame.display.set_caption(self.title, self.short_title)
 
-    self.clock = clock.Clock(readonly = False)
-
-    self.__init_managers()
-
-    self.menu = AGMenu()
-
   def _screen_width(self): return self.screen_size[0]
   screen_width = property(_screen_width)
 
@@ -255,30 +436,126 @@ class AGApplication(singleton.Singleton):
 
       self.clock.tick(self.fps)
 
-  def __init_managers(self):
-    self.dbm = dbm.DBManager()
-    self.dbm.import_db(_db)
+  def __init_managers(self, xml_pool = None):
+    '''
+    Import game content. If C{xml_pool} is given XML files are parsed by
+    its worker processes and images are decoded by a pool of threads. The
+    caller owns C{xml_pool} and closes it.
+    '''
 
-    self.gfxm = gfxm.GfxManager()
-    self.gfxm.import_gfx(self.dbm.get(), _gfx)
+    img_pool = None
+    if xml_pool is not None:
+      img_pool = multiprocessing.pool.ThreadPool(options.import_workers)
 
-    self.stgm = stgm.StageManager()
-    self.stgm.import_stages(_stg)
+    try:
+      cache = contentcache.ContentCache(_cache)
+
+      with StartupProfiler.measure('phase', 'db import') as r:
+        self.dbm = dbm.DBManager()
+        self.dbm.import_db(_db, cache = cache, pool = xml_pool)
+      self.import_times['db'] = r['seconds']
+
+      with StartupProfiler.measure('phase', 'gfx import') as r:
+        self.__import_gfx(img_pool)
+      self.import_times['gfx'] = r['seconds']
+
+      with StartupProfiler.measure('phase', 'stages import') as r:
+        self.stgm = stgm.StageManager()
+        self.stgm.import_stages(_stg, cache = cache, pool = xml_pool)
+      self.import_times['stages'] = r['seconds']
+
+      cache.save()
+    finally:
+      if img_pool is not None:
+        img_pool.close()
+        img_pool.join()
+
+    for phase in 'db', 'gfx', 'stages':
+      log.info('%s import (%s): %.3f s' % (phase,
+          'parallel' if self.parallel_import else 'serial',
+          self.import_times[phase]))
+
+  def __import_gfx(self, img_pool = None):
+    '''
+    Import graphics of classes described by the database, using texture
+    atlas if it was built. Images modified after the atlas was built are
+    loaded from their files.
+    '''
+
+    table = None
+    if os.path.isfile(_atlas):
+      table = atlas.AtlasTable().import_file(_atlas)
+      stale = atlas.stale_files(table, _atlas, _gfx)
+      if stale:
+        log.warning('texture atlas is out of date, rebuild it with atlas.py '
+                    '(images newer than atlas: %s)' % ', '.join(stale))
+        for f in stale:
+          del table[f]
+
+    budget = None
+    if options.gfx_budget is not None:
+      budget = int(options.gfx_budget * 1024 * 1024)
+
+    self.gfxm = gfxm.GfxManager()
+    self.gfxm.import_gfx(self.dbm.get(), _gfx, pool = img_pool,
+                         atlas = table, lazy = options.lazy_gfx,
+                         budget = budget)
 
   @staticmethod
   def play_level(level_name):
-    AGLevel.run(level_name)
+    AGLevel.play_level(level_name)
+
+  def simulate(self, level_name = None, duration = 60.):
+    '''Play level for C{duration} seconds of stage time as fast as possible
+       and report how many simulated seconds passed per wall-clock second.
+       Meant to be used in headless mode.
+    '''
+    t = time.time()
+    level = AGLevel.play_level(level_name, duration * 1000)
+    wall = time.time() - t
+
+    simulated = level.stage_clock / 1000.
+    report = '%s: %.1f s simulated in %.2f s (%d frames, %d ticks), ' \
+             '%.1f simulated s per wall s' % (level.name, simulated, wall,
+                                               level.frames, level.ticks,
+                                               simulated / max(wall, 1e-6))
+    log.info(report)
+    print report
+
+    ObjectPool.log_stats()
+    level.collisions.log_stats()
+
 
+app = None
 
-app = AGApplication.singleton()
+def bootstrap():
+  '''
+  Create the C{L{app}} singleton and bind game classes to their
+  configuration. Modules which read C{L{app}} when imported are imported
+  here, once it exists.
+
+  Must not run while this module is being imported: parallel content import
+  waits for worker threads which would block on the import lock.
+  '''
 
+  global app, base, spaceship, mover, spawner, background
+  app = AGApplication.singleton()
 
-import spaceship
-import mover
+  import base
+  import spaceship
+  import mover
+  import spawner
+  import background
+
+  # report errors in class configuration and stage schedules at load time
+  Registry.validate_db(app.dbm.get())
+  base.bind_all(app.dbm.get(), spaceship)
+  spawner.Spawner.compile_all(app.stgm.get())
+
+  return app
 
 # temp
 import weakref
-import background
 #
 
 
@@ -469,6 +746,20 @@ class AGLevel(object):
      @type hud: C{L{hud.Hud}}
      @ivar hud: In-level head-up display.
 
+     @type spawner: C{L{spawner.Spawner}}
+     @ivar spawner: Scheduler of objects spawned during the level.
+
+     @type headless: C{bool}
+     @ivar headless: Flag determining whether the level runs without drawing
+       anything (see C{L{AGApplication.simulate}}).
+
+     @type frames: C{int}
+     @ivar frames: Number of frames played so far.
+
+     @type ticks: C{int}
+     @ivar ticks: Number of simulation ticks run so far. Equal to C{frames}
+       unless the tick rate is fixed (see C{L{clock.Clock.set_tick_rate}}).
+
      @type last_played: C{unicode}
      @cvar last_played: Name of the level that was played last.
   '''
@@ -492,147 +783,182 @@ class AGLevel(object):
     self.grpm.add('shields')
     self.grpm.add('bonuses')
 
+    self.collisions = collision.CollisionPhase(
+        pixel_perfect = app.pixel_perfect)
+
+    self.spawner = spawner.Spawner(name, self.stgm.get()[name])
+
     self.stage_clock = 0
+    self.frames = 0
+    self.ticks = 0
+    self.headless = app.headless
+
+    gfxm.GfxManager().begin_stage()
+    ObjectPool.clear()
+
+    ProjectileStore.current = None
+    if app.numpy_projectiles:
+      ProjectileStore.current = ProjectileStore()
+    self.projectiles = ProjectileStore.current
+
+    MoverBatch.current = None
+    if app.numpy_movers:
+      MoverBatch.current = MoverBatch()
+    self.movers = MoverBatch.current
 
     self.hud = hud.Hud()
 
     app.screen.fill(Color('black'))
 
-  def run(self):
-    '''Start the level loop.
-    '''
-    stages = self.stgm.get()
-
-    g_draw       = self.grpm.get('draw')
-    g_ship       = self.grpm.get('ship')
-    g_enemies    = self.grpm.get('enemies')
-    g_beams      = self.grpm.get('beams')
-    g_explosions = self.grpm.get('explosions')
-    g_shields    = self.grpm.get('shields')
-    g_bonuses    = self.grpm.get('bonuses')
-    g_enemy_projectiles  = self.grpm.get('enemy_projectiles')
-    g_player_projectiles = self.grpm.get('player_projectiles')
+  def run(self, duration = None):
+    '''Start the level loop. Every frame runs as many simulation ticks (see
+       C{L{tick}}) as the clock asks for and draws the result. With a fixed
+       tick rate sprites are drawn at positions interpolated between the
+       last two ticks.
 
+       @type  duration: C{int} or C{None}
+       @param duration: If given, the loop ends as soon as C{duration}
+         miliseconds of stage time pass.
+    '''
     clear_bg = lambda surf, rect: surf.fill(Color('black'), rect)
 
     # temp
-    ship = weakref.ref( spaceship.PlayerShip((175, app.screen_size[1] - 60),
-                                             g_ship) )
-    back = background.SpaceBackground()
+    self.ship = weakref.ref( spaceship.PlayerShip((175, app.screen_size[1] - 60),
+                                                  self.grpm.get('ship')) )
+    self.back = background.SpaceBackground()
     #
 
-    running = True
-    while True:
-      for spawn_time in stages[self.name]['spawn']:
-        if spawn_time <= self.stage_clock:
-          while stages[self.name]['spawn'][spawn_time]:
-            spawn = stages[self.name]['spawn'][spawn_time].pop()
-            pos = spawn['x'], spawn['y']
-
-            object_cls = eval('spaceship.' + spawn['object_cls_name'])
-            if spawn['object_base_cls_name']:
-              if spawn['object_base_cls_name'] == 'Projectile':
-                if not spawn.has_key('object_params'):
-                  raise ValueError, "Params for projectile '%s' in stage %s \
-                      not set" % (spawn['object_cls_name'], self.name)
-
-                if not spawn['object_params'].has_key('dir'):
-                  raise ValueError, "Invalid 'dir' for projectile '%s' in \
-                      stage %s" % (spawn['object_cls_name'], self.name)
-
-                if not spawn['object_params'].has_key('collision_group'):
-                  raise ValueError, "Invalid 'collision_group' for projectile \
-                      '%s' in stage %s" % (spawn['object_cls_name'], self.name)
-
-                params = spawn['object_params']
-
-                dir = params['dir']
-                g_coll = self.grpm.get(params['collision_group'])
-                object = object_cls(pos, dir, g_coll)
-
-              elif spawn['object_base_cls_name'] == 'Bonus':
-                pass
-              else:
-                raise ValueError, "Invalid value '%s' for attrubite \
-                    'object_base_cls_name' in stage %s" % \
-                    (spawn['object_base_cls_name'], self.name)
-            else:
-                object = object_cls(pos)
-
-            if spawn['bonus_cls_name']:
-              if isinstance(object, spaceship.BonusHolder):
-                object.set_bonus(spawn['bonus_cls_name'], spawn['bonus_params'])
-              else:
-                raise ValueError, "Instances of %s can not hold bonuses." \
-                    % object.__class__.__name__
-
-            if spawn['mover_cls_name']:
-              mover_cls = eval("mover.%s" % spawn['mover_cls_name'])
-              m = mover_cls(pos, object.max_speed, spawn['mover_params'])
-              object.set_mover(m)
-
-            for g in spawn['groups']:
-              if g == 'enemies':
-                g_enemies.add(object)
-              elif g == 'explosions':
-                g_explosions.add(object)
-              elif g == 'enemy_projectiles':
-                g_enemy_projectiles.add(object)
-              elif g == 'player_projectiles':
-                g_player_projectiles.add(object)
+    g_draw = self.grpm.get('draw')
+    interpolate = app.clock.is_fixed() and not self.headless
+    previous = None
 
+    while duration is None or self.stage_clock < duration:
       # time management
       app.clock.tick(app.fps)
-      self.stage_clock += app.clock.get_time()
+      self.frames += 1
 
-      for event in pygame.event.get():
-        if   event.type == pygame.QUIT: sys.exit()
-        elif event.type == pygame.KEYDOWN:
-          if   event.key == pygame.K_q: sys.exit()
-          # temp
-          elif event.key == pygame.K_p: app.pause()  # pause
-          #
-          elif event.key == pygame.K_s:
-            if ship(): ship().next_weapon()
-          elif event.key == pygame.K_a:
-            if ship(): ship().previous_weapon()
-          elif event.key == pygame.K_x:
-            if ship(): ship().activate_shield(True)
-        elif event.type == pygame.KEYUP:
-          if   event.key == pygame.K_UP:
-            if ship(): ship().fly_up(False)
-          elif event.key == pygame.K_x:
-            if ship(): ship().activate_shield(False)
-    
-      pressed_keys = pygame.key.get_pressed()
-      if pressed_keys[pygame.K_UP]:
-        if ship(): ship().fly_up(True)
-      if pressed_keys[pygame.K_DOWN]:
-        if ship(): ship().fly_down()
-      if pressed_keys[pygame.K_LEFT]:
-        if ship(): ship().fly_left()
-      if pressed_keys[pygame.K_RIGHT]:
-        if ship(): ship().fly_right()
-      if pressed_keys[pygame.K_z]:
-        if ship(): ship().shoot()
-
-      back.clear(app.screen, clear_bg)
+      self.handle_events()
+
+      ticks = app.clock.ticks()
+      for i in xrange(ticks):
+        if interpolate and i == ticks - 1:
+          previous = self.snapshot(g_draw)
+        self.tick(g_draw)
+
+      if self.headless:
+        continue
+
+      self.back.clear(app.screen, clear_bg)
       g_draw.clear(app.screen, clear_bg)
       self.hud.clear(app.screen, clear_bg)
 
-      back.update()
-      g_draw.update()
       self.hud.update()
 
-      back.draw(app.screen)
+      moved = []
+      if previous is not None:
+        moved = self.interpolate(previous, app.clock.alpha())
+
+      self.back.draw(app.screen)
       g_draw.draw(app.screen)
       self.hud.draw(app.screen)
 
+      for sprite, pos in moved:
+        sprite.rect.topleft = pos
+
       pygame.display.update()
 
+  def tick(self, g_draw):
+    '''Advance the level by one simulation tick (frame span of the clock).
+    '''
+    self.spawn()
+    self.stage_clock += app.clock.frame_span()
+    self.ticks += 1
+
+    self.handle_input()
+
+    if self.projectiles is not None:
+      self.projectiles.update()
+    if self.movers is not None:
+      self.movers.step()
+
+    if not self.headless:
+      self.back.update()
+    g_draw.update()
+    self.collisions.run()
+
+  def snapshot(self, group):
+    '''Return rects of sprites of C{group} and their current positions.
+    '''
+    return [(s, s.rect, s.rect.topleft) for s in group.sprites()]
+
+  def interpolate(self, snapshot, alpha):
+    '''Move rects of sprites for drawing to positions between those in
+       C{snapshot} (C{alpha} 0) and current ones (C{alpha} 1). Sprites
+       killed or repositioned with a new rect since the snapshot are left
+       as they are. Return list of moved sprites and their current
+       positions, which have to be restored after drawing.
+    '''
+    moved = []
+    for sprite, rect, (x, y) in snapshot:
+      if sprite.rect is not rect or rect.topleft == (x, y) or \
+          not sprite.alive():
+        continue
+
+      moved.append((sprite, rect.topleft))
+      rect.topleft = (int(round(x + (rect.left - x) * alpha)),
+                      int(round(y + (rect.top - y) * alpha)))
+    return moved
+
+  def spawn(self):
+    '''Spawn objects scheduled up to the current stage time.
+    '''
+    self.spawner.spawn(self.stage_clock, self.grpm)
+
+  def handle_events(self):
+    '''Process pending pygame events.
+    '''
+    ship = self.ship
+
+    for event in pygame.event.get():
+      if   event.type == pygame.QUIT: sys.exit()
+      elif event.type == pygame.KEYDOWN:
+        if   event.key == pygame.K_q: sys.exit()
+        # temp
+        elif event.key == pygame.K_p: app.pause()  # pause
+        #
+        elif event.key == pygame.K_s:
+          if ship(): ship().next_weapon()
+        elif event.key == pygame.K_a:
+          if ship(): ship().previous_weapon()
+        elif event.key == pygame.K_x:
+          if ship(): ship().activate_shield(True)
+      elif event.type == pygame.KEYUP:
+        if   event.key == pygame.K_UP:
+          if ship(): ship().fly_up(False)
+        elif event.key == pygame.K_x:
+          if ship(): ship().activate_shield(False)
+
+  def handle_input(self):
+    '''Steer the player's ship according to keys being held down.
+    '''
+    ship = self.ship
+
+    pressed_keys = pygame.key.get_pressed()
+    if pressed_keys[pygame.K_UP]:
+      if ship(): ship().fly_up(True)
+    if pressed_keys[pygame.K_DOWN]:
+      if ship(): ship().fly_down()
+    if pressed_keys[pygame.K_LEFT]:
+      if ship(): ship().fly_left()
+    if pressed_keys[pygame.K_RIGHT]:
+      if ship(): ship().fly_right()
+    if pressed_keys[pygame.K_z]:
+      if ship(): ship().shoot()
+
   @staticmethod
-  def play_level(name=None):
+  def play_level(name=None, duration=None):
     '''Run next unplayed level or the level specified by C{level} parameter.
+       Return the played level.
     '''
     if not name:
       stgman = stgm.StageManager()
@@ -647,15 +973,21 @@ class AGLevel(object):
         name = stages[0]
 
     level = AGLevel(name)
-    level.run()
+    level.run(duration)
+    return level
 
 
 if __name__ == '__main__':
+  # the game runs in the application module imported by other modules, not
+  # in this copy of it
+  import application
   log = logging.getLogger('__main__')
-  agrajag = AGApplication.singleton()
-  if len(sys.argv) > 1:
-    log.debug('trying to play level: %s' % sys.argv[1])
-    agrajag.play_level(sys.argv[1])
+  agrajag = application.bootstrap()
+  if options.headless:
+    agrajag.simulate(options.level, options.sim_duration)
+  elif options.level:
+    log.debug('trying to play level: %s' % options.level)
+    agrajag.play_level(options.level)
   else:
     log.debug('no commandline args given')
     agrajag.main()
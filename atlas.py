@@ -0,0 +1,254 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Texture atlas builder.
+
+Packs regions of image files referenced by the game database into a few
+large atlas sheets and writes a placement table describing where every
+region ended up. C{L{GfxManager}} uses the table to load the sheets instead
+of separate image files and remaps resource states accordingly.
+
+Usage: C{python atlas.py [--size N] [--padding N] [db_dir] [gfx_dir]}
+'''
+
+import os
+import argparse
+import xml.dom.minidom
+
+import pygame
+
+from xmlmanager import XMLManager, ElementTree
+
+
+ATLAS_DIR = 'atlas'
+TABLE_FILE = 'atlas.xml'
+
+
+def collect_regions(conf):
+  """
+  Return dictionary mapping image file name to its region C{(x, y, w, h)}
+  actually used by resources of classes described by C{conf}. A region is
+  the bounding box of all states of all resources using that file.
+
+  @type  conf: C{dict}
+  @param conf: Classes' configuration as returned by C{DBManager.get}.
+  """
+
+  bounds = {}
+  for class_name in conf:
+    gfx = conf[class_name]['gfx']
+    for res in gfx.values():
+      for off in res['states'].values():
+        state = (off['x_off'], off['y_off'],
+                 off['x_off'] + res['state_w'], off['y_off'] + res['state_h'])
+        if res['file'] in bounds:
+          b = bounds[res['file']]
+          state = (min(b[0], state[0]), min(b[1], state[1]),
+                   max(b[2], state[2]), max(b[3], state[3]))
+        bounds[res['file']] = state
+
+  regions = {}
+  for f, b in bounds.items():
+    regions[f] = b[0], b[1], b[2] - b[0], b[3] - b[1]
+
+  return regions
+
+
+def pack(sizes, max_size, padding = 1):
+  """
+  Pack rectangles into as few sheets as possible using shelf packing
+  (rectangles sorted by height are put side by side on horizontal shelves).
+  Rectangles larger than C{max_size} get a sheet of their own.
+
+  Return pair: dictionary mapping key to C{(sheet_index, x, y)} and list of
+  sheet sizes.
+
+  @type  sizes: sequence
+  @param sizes: Sequence of C{(key, w, h)} triples.
+
+  @type  max_size: pair of C{int}s
+  @param max_size: Maximal size of a single sheet.
+
+  @type  padding: C{int}
+  @param padding: Empty space left between packed rectangles.
+  """
+
+  sheets = []
+  placements = {}
+  for key, w, h in sorted(sizes, key = lambda s: (s[2], s[1]), reverse = True):
+    pw, ph = w + padding, h + padding
+
+    for index, sheet in enumerate(sheets):
+      pos = _place(sheet, pw, ph)
+      if pos is not None:
+        break
+    else:
+      index = len(sheets)
+      sheet = {'max' : (max(max_size[0], pw), max(max_size[1], ph)),
+               'shelves' : [], 'size' : (0, 0)}
+      sheets.append(sheet)
+      pos = _place(sheet, pw, ph)
+
+    placements[key] = index, pos[0], pos[1]
+    sheet['size'] = (max(sheet['size'][0], pos[0] + w),
+                     max(sheet['size'][1], pos[1] + h))
+
+  return placements, [s['size'] for s in sheets]
+
+
+def _place(sheet, w, h):
+  """
+  Find place for C{w}x{h} rectangle on C{sheet} and return its top-left
+  corner or C{None} if it does not fit.
+  """
+
+  max_w, max_h = sheet['max']
+  if w > max_w:
+    return None
+
+  for shelf in sheet['shelves']:
+    if h <= shelf['h'] and shelf['x'] + w <= max_w:
+      pos = shelf['x'], shelf['y']
+      shelf['x'] += w
+      return pos
+
+  y = sum(s['h'] for s in sheet['shelves'])
+  if y + h > max_h:
+    return None
+
+  sheet['shelves'].append({'x' : w, 'y' : y, 'h' : h})
+  return 0, y
+
+
+def build(conf, gfx_dir, max_size = (1024, 1024), padding = 1):
+  """
+  Build atlas sheets for classes described by C{conf} and write them
+  together with the placement table to C{ATLAS_DIR} subdirectory of
+  C{gfx_dir}. Return path of the placement table.
+  """
+
+  regions = collect_regions(conf)
+
+  images = {}
+  for f in regions:
+    images[f] = pygame.image.load(os.path.join(gfx_dir, f))
+    # clip region to image area
+    r = pygame.Rect(regions[f]).clip(images[f].get_rect())
+    regions[f] = r.x, r.y, r.w, r.h
+
+  placements, sizes = pack([(f, r[2], r[3]) for f, r in regions.items()],
+                           max_size, padding)
+
+  out_dir = os.path.join(gfx_dir, ATLAS_DIR)
+  if not os.path.isdir(out_dir):
+    os.makedirs(out_dir)
+
+  sheets = [pygame.Surface(size, pygame.SRCALPHA, 32) for size in sizes]
+  for sheet in sheets:
+    sheet.fill((0, 0, 0, 0))
+
+  for f, (index, x, y) in placements.items():
+    sheets[index].blit(images[f], (x, y), regions[f])
+
+  root = ElementTree.Element('atlas')
+  for index, sheet in enumerate(sheets):
+    sheet_file = 'atlas%d.png' % index
+    pygame.image.save(sheet, os.path.join(out_dir, sheet_file))
+
+    sheet_element = ElementTree.SubElement(root, 'sheet',
+        {'file' : '/'.join((ATLAS_DIR, sheet_file)),
+         'w' : str(sheet.get_width()),
+         'h' : str(sheet.get_height())})
+
+    for f in sorted(placements):
+      if placements[f][0] != index:
+        continue
+
+      r = regions[f]
+      ElementTree.SubElement(sheet_element, 'region',
+          {'file' : f,
+           'x' : str(r[0]), 'y' : str(r[1]), 'w' : str(r[2]), 'h' : str(r[3]),
+           'dest_x' : str(placements[f][1]), 'dest_y' : str(placements[f][2])})
+
+  table_path = os.path.join(out_dir, TABLE_FILE)
+  doc = xml.dom.minidom.parseString(ElementTree.tostring(root, 'utf-8'))
+  table = open(table_path, 'w')
+  doc.writexml(table, indent='', addindent='  ', newl='\n')
+  table.close()
+
+  return table_path
+
+
+def stale_files(table, table_path, gfx_dir):
+  """
+  Return sorted names of image files placed in atlas by C{table} (as
+  returned by C{L{AtlasTable}}, read from C{table_path}) which were modified
+  after the table was written. Their regions on the sheets are out of date.
+  """
+
+  built = os.path.getmtime(table_path)
+  stale = []
+  for f in table:
+    path = os.path.join(gfx_dir, f)
+    if os.path.isfile(path) and os.path.getmtime(path) > built:
+      stale.append(f)
+
+  return sorted(stale)
+
+
+class AtlasTable(XMLManager):
+  """
+  Reader of placement tables written by C{L{build}}.
+  """
+
+  def import_file(self, filepath):
+    """
+    Import placement table and return it as a dictionary mapping image file
+    name to its placement: dictionary with keys C{'sheet'} (sheet file
+    name relative to graphics directory), C{'x'}, C{'y'}, C{'w'}, C{'h'}
+    (region of the original image) and C{'dest_x'}, C{'dest_y'} (position
+    of the region on the sheet).
+    """
+
+    regions = {}
+    sheet = None
+    for event, elem in self.iterparse(filepath):
+      if event == 'start':
+        if elem.tag == 'sheet':
+          sheet = self.get_attr(elem, 'file')
+        elif elem.tag == 'region' and sheet is not None:
+          regions[self.get_attr(elem, 'file')] = {
+              'sheet' : sheet,
+              'x' : int(self.get_attr(elem, 'x')),
+              'y' : int(self.get_attr(elem, 'y')),
+              'w' : int(self.get_attr(elem, 'w')),
+              'h' : int(self.get_attr(elem, 'h')),
+              'dest_x' : int(self.get_attr(elem, 'dest_x')),
+              'dest_y' : int(self.get_attr(elem, 'dest_y'))
+              }
+      else:
+        if elem.tag == 'sheet':
+          sheet = None
+        elem.clear()
+
+    return regions
+
+
+if __name__ == '__main__':
+  from dbmanager import DBManager
+
+  here = os.path.dirname(__file__)
+
+  parser = argparse.ArgumentParser(description='Build Agrajag texture atlas.')
+  parser.add_argument('db_dir', nargs='?', default=os.path.join(here, 'db'))
+  parser.add_argument('gfx_dir', nargs='?', default=os.path.join(here, 'gfx'))
+  parser.add_argument('--size', type=int, default=1024,
+                      help='maximal width and height of a sheet')
+  parser.add_argument('--padding', type=int, default=1,
+                      help='space between packed regions')
+  args = parser.parse_args()
+
+  dbman = DBManager()
+  dbman.import_db(args.db_dir)
+
+  print build(dbman.get(), args.gfx_dir, (args.size, args.size), args.padding)
@@ -6,23 +6,144 @@ This module contains base definitions needed by different modules.
 """
 
 import pygame
+import inspect
 from math import fabs
 
 from dbmanager import DBManager
 from clock import Clock
 
 
+_MISSING = object()
+
+# values of configurable attributes defined in code, saved before binding
+_code_defaults = {}
+
+
+def _config_names(cls):
+  """
+  Return names of configurable attributes (C{config_attrs}) declared by
+  C{cls} and its base classes.
+  """
+
+  names = []
+  for c in inspect.getmro(cls):
+    for name in c.__dict__.get('config_attrs', ()):
+      if name not in names:
+        names.append(name)
+  return names
+
+
+def _code_default(cls, name):
+  """
+  Return value of attribute C{name} of C{cls} as defined in code, ignoring
+  values bound from the database to C{cls} or its base classes.
+  """
+
+  for c in inspect.getmro(cls):
+    defaults = _code_defaults.get(c, {})
+    if name in defaults:
+      if defaults[name] is not _MISSING:
+        return defaults[name]
+    elif name in c.__dict__:
+      return c.__dict__[name]
+  return _MISSING
+
+
+def bind_config(cls, props, hitbox = None):
+  """
+  Bind database properties C{props} to class C{cls}. C{props} becomes class
+  attribute C{cfg} and every attribute named in C{config_attrs} of C{cls}
+  or its base classes is set on C{cls} to its value from C{props}.
+  Attributes missing in C{props} get default values defined in code (values
+  bound to base classes are not inherited). If there is no default value
+  C{ValueError} is raised.
+
+  @type  cls: class
+  @param cls: Game class, derived from C{L{AGObject}}.
+
+  @type  props: dict
+  @param props: Class properties (see C{L{DBManager}}).
+
+  @type  hitbox: tuple or None
+  @param hitbox: Class hitbox (see C{L{DBManager}}), bound as C{hitbox}.
+  """
+
+  names = _config_names(cls)
+  if cls not in _code_defaults:
+    _code_defaults[cls] = dict((n, cls.__dict__.get(n, _MISSING))
+                               for n in names)
+
+  values = {}
+  for name in names:
+    values[name] = props[name] if name in props else _code_default(cls, name)
+    if values[name] is _MISSING:
+      raise ValueError("%s.%s does not have any value defined" %
+                       (cls.__name__, name))
+
+  for name in names:
+    setattr(cls, name, values[name])
+  cls.cfg = props
+  cls.hitbox = hitbox
+  cls._config_bound = True
+
+
+def bind_all(conf, *modules):
+  """
+  Bind database properties to all game classes defined in C{modules} which
+  are described in C{conf} (see C{L{bind_config}}). Meant to be called once
+  the database is imported, so that configuration errors are reported at
+  load time.
+
+  @type  conf: dict
+  @param conf: Classes' configuration as returned by C{DBManager.get}.
+  """
+
+  for module in modules:
+    for name, cls in vars(module).items():
+      if inspect.isclass(cls) and issubclass(cls, AGObject) and \
+          cls.__module__ == module.__name__ and name in conf:
+        bind_config(cls, conf[name]['props'], conf[name].get('hitbox'))
+
+
 class AGObject:
   """
   Base class for all game objects.
 
+  Game classes described in the database declare names of attributes
+  configured by the database in C{config_attrs}. Those attributes, as well
+  as the whole class configuration C{cfg}, are bound once per class (see
+  C{L{bind_config}}), not per instance.
+
+  @type config_attrs: tuple
+  @cvar config_attrs: Names of class attributes read from the database
+    (names declared by base classes are included automatically).
+
+  @type hitbox: tuple or None
+  @cvar hitbox: Shapes used by collision tests instead of object's rect
+    (see C{L{DBManager}}).
+
   @type clock: C{L{Clock}}
   @ivar clock:
   """
-  
+
+  config_attrs = ()
+  hitbox = None
+
   def __init__(self):
     self.clock = Clock()
 
+  def _bind_config(self):
+    """
+    Make sure configuration of object's class is bound. Normally classes are
+    bound at load time by C{L{bind_all}}, classes missed there are bound on
+    creation of their first instance.
+    """
+
+    cls = self.__class__
+    if not cls.__dict__.get('_config_bound'):
+      conf = DBManager().get(cls.__name__)
+      bind_config(cls, conf['props'], conf.get('hitbox'))
+
   def _setattrs(self, params, values):
     """
     Setup instance attributes. 
@@ -70,6 +191,9 @@ class Overlay(pygame.sprite.Sprite):
   should be added to group 'draw' immediatelly after its owner is added to
   that groups in order to display properly (not to display over other 
   objects).
+
+  Overlay's image only grows (see C{L{reserve}}), so an overlay sized up
+  front for all its animations is never reallocated while they play.
   """
 
   def __init__(self, *groups):
@@ -100,7 +224,7 @@ class Overlay(pygame.sprite.Sprite):
     if rect is None:
       rect = AGRect((0, 0), self.image.get_size())
     else:
-      self.resize(rect.size)
+      self.reserve(rect)
       rect = AGRect(rect)
       
       rect[0] += self.rect.width / 2.
@@ -135,7 +259,7 @@ class Overlay(pygame.sprite.Sprite):
     @param area: Image fragment to be blit.
     """
 
-    self.resize((fabs(dest[0]) + area.width, fabs(dest[1]) + area.height))
+    self.reserve(AGRect(dest[0], dest[1], area.width, area.height))
 
     dest = list(dest)
     dest[0] += self.rect.width / 2.
@@ -143,26 +267,31 @@ class Overlay(pygame.sprite.Sprite):
 
     self.image.blit(image, dest, area)
 
-  def resize(self, dest):
+  def reserve(self, rect):
     """
-    If needed resize overlay to fit C{dest}.
+    If needed enlarge overlay so that it contains C{rect}. Overlay content
+    is preserved.
 
-    Warning. Overlay content is not preserved (yet) which may
-    cause filcker or other negative effects.
-
-    @type  dest: sequence
-    @param dest: Area needed for new blit.
+    @type  rect: C{pygame.Rect}
+    @param rect: Area needed for drawing. Coordinates of top-left corner
+    of area relative to overlay center.
     """
 
-    if 2 * dest[0] <= self.rect.width and 2 * dest[1] <= self.rect.height:
+    w = 2 * int(max(fabs(rect.left), fabs(rect.right)))
+    h = 2 * int(max(fabs(rect.top), fabs(rect.bottom)))
+    if w <= self.rect.width and h <= self.rect.height:
       return
 
-    center = self.rect.center
+    w, h = max(w, self.rect.width), max(h, self.rect.height)
+    image = pygame.Surface((w, h), pygame.SRCALPHA, self.image)
+    image.fill((0, 0, 0, 0))
+    image.blit(self.image, ((w - self.rect.width) / 2,
+                            (h - self.rect.height) / 2))
 
-    self.rect.inflate_ip(2 * dest[0], 2 * dest[1])
+    center = self.rect.center
+    self.rect.size = w, h
     self.rect.center = center
-
-    self.image = pygame.Surface(self.rect.size, pygame.SRCALPHA, self.image)
+    self.image = image
 
   def align(self, pos, align = 'center'):
     """
@@ -12,12 +12,35 @@ class Clock(object):
   It is mainly used to globally access the length of the last frame.
   It is a wrapper for C{pygame.time.Clock}.
 
+  With a fixed tick rate (see C{L{set_tick_rate}}) game logic is advanced
+  in simulation ticks of constant length instead of frames. Time of
+  rendered frames is accumulated and C{L{ticks}} tells how many ticks fit
+  in it; C{L{frame_span}} is then the length of a tick. Time left over is
+  carried to the next frame, C{L{alpha}} tells what part of a tick it is.
+
   @type __frame_span: unsigned integer
   @cvar __frame_span: Length of the last game frame in miliseconds.
 
   @type __total_time: unsigned integer
   @cvar __total_time: Total time elapsed since game start in miliseconds.
 
+  @type __synthetic_span: unsigned integer or C{None}
+  @cvar __synthetic_span: If set, every tick advances the clock by this
+      many miliseconds without waiting for the wall-clock time to pass
+      (see C{L{set_synthetic}}).
+
+  @type __tick_span: unsigned integer or C{None}
+  @cvar __tick_span: Length of a simulation tick in miliseconds, C{None}
+      if logic is advanced once per frame by its length.
+
+  @type __max_ticks: unsigned integer
+  @cvar __max_ticks: Maximal number of ticks run per frame. Time which
+      does not fit in them is dropped, so a slow machine slows the game
+      down instead of falling further behind with every frame.
+
+  @type __accumulator: unsigned integer
+  @cvar __accumulator: Time of rendered frames not simulated yet.
+
   @type readonly: boolean
   @ivar readonly: Determines whether the instance may actually
       alter the game clock. Defaults to True.
@@ -25,6 +48,10 @@ class Clock(object):
 
   __frame_span = 0
   __total_time = 0
+  __synthetic_span = None
+  __tick_span = None
+  __max_ticks = 5
+  __accumulator = 0
   __clock = pygame.time.Clock()
 
   def __init__(self, readonly=True):
@@ -45,23 +72,117 @@ class Clock(object):
     if self.readonly:
       raise Exception('Instance not allowed to alter the game clock.')
     else:
-      Clock.__frame_span = Clock.__clock.tick(fps)
-      Clock.__total_time += Clock.__frame_span
+      if Clock.__synthetic_span is not None:
+        span = Clock.__synthetic_span
+      else:
+        span = Clock.__clock.tick(fps)
+      Clock.__total_time += span
 
-      return Clock.__frame_span
+      if Clock.__tick_span is None:
+        Clock.__frame_span = span
+      else:
+        Clock.__frame_span = Clock.__tick_span
+        Clock.__accumulator += span
+
+      return span
+
+  def set_tick_rate(self, rate = None, max_ticks = 5):
+    """
+    Advance game logic in C{rate} ticks per second, at most C{max_ticks}
+    ticks per frame. Passing C{None} restores advancing logic once per
+    frame.
+
+    @type  rate: unsigned integer or C{None}
+    @param rate: Number of simulation ticks per second.
+
+    @type  max_ticks: unsigned integer
+    @param max_ticks: Maximal number of ticks run to catch up with a long
+        frame.
+    """
+    if self.readonly:
+      raise Exception('Instance not allowed to alter the game clock.')
+    else:
+      Clock.__tick_span = None if rate is None else \
+                          max(1, int(round(1000. / rate)))
+      Clock.__max_ticks = max_ticks
+      Clock.__accumulator = 0
+
+  def ticks(self):
+    """
+    Return number of simulation ticks to run after the last frame and
+    consume their time. Always 1 if the tick rate is not fixed.
+    """
+    if self.readonly:
+      raise Exception('Instance not allowed to alter the game clock.')
+
+    span = Clock.__tick_span
+    if span is None:
+      return 1
+
+    n = Clock.__accumulator // span
+    if n > Clock.__max_ticks:
+      n = Clock.__max_ticks
+      Clock.__accumulator = Clock.__accumulator % span
+    else:
+      Clock.__accumulator -= n * span
+
+    return n
+
+  @staticmethod
+  def alpha():
+    """
+    Return part of a tick (from 0 to 1) passed since the last simulated
+    state, used to interpolate rendered positions. Always 1 if the tick
+    rate is not fixed.
+    """
+    if Clock.__tick_span is None:
+      return 1.
+    return Clock.__accumulator / float(Clock.__tick_span)
+
+  @staticmethod
+  def is_fixed():
+    return Clock.__tick_span is not None
+
+  def set_synthetic(self, frame_span = None):
+    """
+    Make the clock advance by fixed C{frame_span} on every tick, regardless
+    of the wall-clock time and without limiting the framerate. Passing
+    C{None} restores normal operation.
+
+    @type  frame_span: unsigned integer or C{None}
+    @param frame_span: Length of a single frame in miliseconds.
+    """
+    if self.readonly:
+      raise Exception('Instance not allowed to alter the game clock.')
+    else:
+      Clock.__synthetic_span = frame_span
+
+  @staticmethod
+  def is_synthetic():
+    return Clock.__synthetic_span is not None
 
   @staticmethod
   def get_time():
+    if Clock.__synthetic_span is not None:
+      return Clock.__frame_span
     return Clock.__clock.get_time()
 
   @staticmethod
   def get_rawtime():
+    if Clock.__synthetic_span is not None:
+      return Clock.__frame_span
     return Clock.__clock.get_rawtime()
 
+  @staticmethod
+  def total_time():
+    return Clock.__total_time
+
   @staticmethod
   def frame_span():
     return Clock.__frame_span
 
   @staticmethod
   def get_fps():
+    if Clock.__synthetic_span:
+      return 1000. / Clock.__synthetic_span
     return Clock.__clock.get_fps()
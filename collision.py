@@ -0,0 +1,313 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Per-frame collision detection between sprite groups.
+'''
+
+from groupmanager import GroupManager
+
+import logging
+log = logging.getLogger('CollisionPhase')
+
+
+# (source group, target group, name of source's handler method)
+COLLISION_MATRIX = (
+  ('player_projectiles', 'enemies', 'collide'),
+  ('enemy_projectiles', 'ship', 'collide'),
+  ('bonuses', 'ship', 'collide'),
+)
+
+
+def _shapes(sprite):
+  """
+  Return hitbox shapes of C{sprite} translated to screen coordinates, or
+  its rect as the only shape if it has no hitbox.
+  """
+
+  x, y = sprite.rect.topleft
+  if sprite.hitbox is None:
+    return (('rect', x, y, sprite.rect.width, sprite.rect.height),)
+
+  return [(s[0], s[1] + x, s[2] + y) + s[3:] for s in sprite.hitbox]
+
+
+def _overlap(a, b):
+  """
+  Tell whether shapes C{a} and C{b} overlap (touching shapes do not).
+  """
+
+  if a[0] == 'rect' and b[0] == 'rect':
+    return a[1] < b[1] + b[3] and b[1] < a[1] + a[3] and \
+           a[2] < b[2] + b[4] and b[2] < a[2] + a[4]
+
+  if a[0] == 'circle' and b[0] == 'circle':
+    dx, dy, r = a[1] - b[1], a[2] - b[2], a[3] + b[3]
+    return dx * dx + dy * dy < r * r
+
+  c, r = (a, b) if a[0] == 'circle' else (b, a)
+  dx = c[1] - min(max(c[1], r[1]), r[1] + r[3])
+  dy = c[2] - min(max(c[2], r[2]), r[2] + r[4])
+  return dx * dx + dy * dy < c[3] * c[3]
+
+
+def collide_hitbox(left, right):
+  """
+  Tell whether hitboxes of sprites C{left} and C{right} (whose rects are
+  known to overlap) overlap. Sprites without hitbox are represented by
+  their rects.
+  """
+
+  if left.hitbox is None and right.hitbox is None:
+    return True
+
+  rshapes = _shapes(right)
+  for a in _shapes(left):
+    for b in rshapes:
+      if _overlap(a, b):
+        return True
+  return False
+
+
+def _boxes(sprite):
+  """
+  Return bounding boxes C{(x, y, w, h)} of hitbox shapes of C{sprite} in
+  screen coordinates, or its rect if it has no hitbox.
+  """
+
+  boxes = []
+  for s in _shapes(sprite):
+    if s[0] == 'rect':
+      boxes.append(s[1:])
+    else:
+      boxes.append((s[1] - s[3], s[2] - s[3], 2 * s[3], 2 * s[3]))
+  return boxes
+
+
+def _sweep(x, y, dx, dy, w, h, box):
+  """
+  Return fraction (0 to 1) of move by C{(dx, dy)} at which box of size
+  C{(w, h)} starting at C{(x, y)} enters C{box}, or None if it does not.
+  """
+
+  bx, by, bw, bh = box
+  enter, leave = 0.0, 1.0
+  for p, d, lo, hi in ((x, dx, bx - w, bx + bw), (y, dy, by - h, by + bh)):
+    if d == 0:
+      if not lo < p < hi:
+        return None
+      continue
+
+    t0 = (lo - p) / float(d)
+    t1 = (hi - p) / float(d)
+    if t0 > t1:
+      t0, t1 = t1, t0
+
+    enter = max(enter, t0)
+    leave = min(leave, t1)
+    if enter >= leave:
+      return None
+
+  return enter
+
+
+def sweep_collide(sprite, index):
+  """
+  Return the first sprite of C{index} hit by C{sprite} on its way from
+  C{sprite.prev_pos} (previous top-left corner of its rect) to its current
+  position, or None. Targets are represented by bounding boxes of their
+  hitbox shapes (see C{L{collide_hitbox}}).
+  """
+
+  rect = sprite.rect
+  x, y = sprite.prev_pos
+  dx, dy = rect.left - x, rect.top - y
+
+  best, best_t = None, None
+  for target in index.query(rect.move(-dx, -dy).union(rect)):
+    for box in _boxes(target):
+      t = _sweep(x, y, dx, dy, rect.width, rect.height, box)
+      if t is not None and (best is None or t < best_t):
+        best, best_t = target, t
+
+  return best
+
+
+def collide_mask(left, right):
+  """
+  Tell whether masks of sprites C{left} and C{right} (whose rects are known
+  to overlap) overlap. Masks are shared by all sprites showing the same
+  graphics state (see C{AGSprite.get_mask}). Sprites without a mask collide
+  by their rects.
+  """
+
+  lmask = left.get_mask()
+  rmask = right.get_mask()
+  if lmask is None or rmask is None:
+    return True
+
+  offset = right.rect.left - left.rect.left, right.rect.top - left.rect.top
+  return lmask.overlap(rmask, offset) is not None
+
+
+def _collide_pixel_perfect(left, right):
+  """
+  Test hitboxes of sprites if any of them has one, masks otherwise.
+  """
+
+  if left.hitbox is None and right.hitbox is None:
+    return collide_mask(left, right)
+  return collide_hitbox(left, right)
+
+
+class CollisionPhase(object):
+  """
+  Detects collisions of all groups of a level in one pass run after sprites
+  are updated. Pairs of colliding groups are given by a matrix of rules
+  C{(source, target, handler)}: every sprite of group C{source} is tested
+  against group C{target} and for the first target it overlaps its method
+  C{handler} is called with the target as the only argument.
+
+  Sprites which name the group they collide with in C{g_coll}
+  (projectiles) are tested against that group instead of the target of
+  the rule. Hits are counted under the rule anyway.
+
+  All hit pairs are found before any handler is called. A pair is skipped
+  if its source or target was killed by a handler called before.
+
+  Target groups are indexed by C{L{SpatialHash}} (see C{L{GroupManager}}),
+  their indexes are rebuilt at the beginning of every pass.
+
+  Sprites whose rects overlap are further tested with C{L{collide_hitbox}}
+  if any of them has a hitbox (see C{L{DBManager}}). Otherwise, in
+  pixel-perfect mode, they are tested with C{L{collide_mask}}.
+
+  Sprites which keep their previous position in C{prev_pos} (projectiles)
+  and moved by at least their own size since the previous frame could jump
+  over their targets. They are tested along their whole path (see
+  C{L{sweep_collide}}) and hit the first target in their way.
+
+  @type matrix: C{tuple}
+  @ivar matrix: Collision rules - triples C{(source, target, handler)}.
+
+  @type tests: C{dict}
+  @ivar tests: Maps rule C{(source, target)} to number of tested sprites.
+
+  @type hits: C{dict}
+  @ivar hits: Maps rule C{(source, target)} to number of found hits.
+
+  @type swept: C{int}
+  @ivar swept: Number of sprites tested along their paths.
+
+  @type passes: C{int}
+  @ivar passes: Number of passes run.
+
+  @type pixel_perfect: C{bool}
+  @ivar pixel_perfect: Tells whether masks are tested.
+  """
+
+  def __init__(self, matrix = COLLISION_MATRIX, pixel_perfect = False):
+    """
+    @type  matrix: C{tuple}
+    @param matrix: Collision rules. Groups named by rules have to exist.
+
+    @type  pixel_perfect: C{bool}
+    @param pixel_perfect: Test masks of sprites whose rects overlap.
+    """
+
+    self.matrix = tuple(matrix)
+    self.pixel_perfect = pixel_perfect
+
+    grpm = GroupManager()
+    for source, target, handler in self.matrix:
+      if grpm.get(source) is None or grpm.get(target) is None:
+        raise ValueError("Unknown group in collision rule %s x %s" %
+                         (source, target))
+      if grpm.get_index(grpm.get(target)) is None:
+        grpm.index(target)
+
+    self.reset_stats()
+
+  def reset_stats(self):
+    """
+    Zero counters.
+    """
+
+    self.tests = dict(((s, t), 0) for s, t, h in self.matrix)
+    self.hits = dict(((s, t), 0) for s, t, h in self.matrix)
+    self.swept = 0
+    self.passes = 0
+
+  def collisions(self):
+    """
+    Return list of C{(source, target, handler)} triples of sprites colliding
+    at the moment according to the matrix.
+    """
+
+    grpm = GroupManager()
+    collided = _collide_pixel_perfect if self.pixel_perfect \
+               else collide_hitbox
+    pairs = []
+
+    indexes = {}
+    for source, target, handler in self.matrix:
+      sources = grpm.get(source).sprites()
+      group = grpm.get(target)
+
+      hits = 0
+      for sprite in sources:
+        g_coll = getattr(sprite, 'g_coll', None)
+        if g_coll is None:
+          g_coll = group
+        if id(g_coll) not in indexes:
+          indexes[id(g_coll)] = grpm.index_of(g_coll)
+
+        hit = self._first_hit(sprite, indexes[id(g_coll)], collided)
+        if hit is not None:
+          pairs.append((sprite, hit, handler))
+          hits += 1
+
+      self.tests[(source, target)] += len(sources)
+      self.hits[(source, target)] += hits
+
+    return pairs
+
+  def _first_hit(self, sprite, index, collided):
+    """
+    Return sprite of C{index} hit by C{sprite} or None.
+    """
+
+    prev = getattr(sprite, 'prev_pos', None)
+    if prev is not None:
+      rect = sprite.rect
+      if abs(rect.left - prev[0]) >= rect.width or \
+          abs(rect.top - prev[1]) >= rect.height:
+        self.swept += 1
+        return sweep_collide(sprite, index)
+
+    hit = index.spritecollide(sprite, False, collided)
+    return hit[0] if hit else None
+
+  def run(self):
+    """
+    Rebuild indexes, find all collisions and dispatch them to handlers.
+    """
+
+    GroupManager().update_indexes()
+
+    for sprite, target, handler in self.collisions():
+      if sprite.alive() and target.alive():
+        getattr(sprite, handler)(target)
+
+    self.passes += 1
+
+  def log_stats(self):
+    """
+    Write counters to the log.
+    """
+
+    for source, target, handler in self.matrix:
+      rule = source, target
+      log.info('%s x %s: %d tested, %d hits in %d passes' %
+               (source, target, self.tests[rule], self.hits[rule],
+                self.passes))
+    log.info('%d sprites tested along their paths' % self.swept)
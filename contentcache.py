@@ -0,0 +1,176 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Persistent cache of content compiled from XML files.
+'''
+
+import os
+import cPickle
+
+import logging
+log = logging.getLogger('ContentCache')
+
+
+class ContentCache(object):
+  """
+  Binary snapshot of data imported by XML managers (C{L{DBManager}},
+  C{L{StageManager}}). Every imported file is stored together with its
+  manifest entry (path, size and modification time) so that only files
+  which changed since the snapshot was written need to be parsed again.
+
+  Snapshot is divided into sections, one per manager. If the snapshot
+  can not be read or was written by an incompatible version of the cache
+  it is discarded as a whole and all content is rebuilt.
+
+  @type VERSION: C{int}
+  @cvar VERSION: Snapshot format version. Bump whenever the structure of
+    imported content changes.
+
+  @type path: C{str}
+  @ivar path: Location of the snapshot file.
+
+  @type sections: C{dict}
+  @ivar sections: Maps section name to dictionary of entries keyed by source
+    file path. Each entry contains keys C{'size'}, C{'mtime'} and
+    C{'content'}.
+
+  @type dirty: C{bool}
+  @ivar dirty: Tells whether the snapshot has to be written back to disk.
+  """
+
+  VERSION = 3
+
+  def __init__(self, path):
+    """
+    Load snapshot from C{path}. Missing or unusable snapshot results in an
+    empty cache.
+
+    @type  path: C{str}
+    @param path: Location of the snapshot file.
+    """
+
+    self.path = path
+    self.sections = {}
+    self.dirty = False
+
+    self.load()
+
+  def load(self):
+    """
+    (Re)load snapshot from disk. Any problem with the snapshot file
+    results in an empty cache (full rebuild).
+    """
+
+    self.sections = {}
+    self.dirty = False
+
+    if not os.path.isfile(self.path):
+      return
+
+    try:
+      f = open(self.path, 'rb')
+      try:
+        data = cPickle.load(f)
+      finally:
+        f.close()
+    except Exception, e:
+      log.debug('discarding unreadable content cache %s: %s' % (self.path, e))
+      self.dirty = True
+      return
+
+    if type(data) is not dict or data.get('version') != ContentCache.VERSION \
+        or type(data.get('sections')) is not dict:
+      log.debug('discarding incompatible content cache %s' % self.path)
+      self.dirty = True
+      return
+
+    self.sections = data['sections']
+
+  def _stat(self, filepath):
+    """
+    Return manifest key and C{(size, mtime)} pair describing C{filepath}.
+    """
+
+    st = os.stat(filepath)
+    return os.path.abspath(filepath), (st.st_size, st.st_mtime)
+
+  def lookup(self, section, filepath):
+    """
+    Return cached content of C{filepath} or C{None} if the file is not
+    cached or it changed since it was cached.
+
+    @type  section: C{str}
+    @param section: Name of the cache section (e.g. C{'db'}).
+
+    @type  filepath: C{str}
+    @param filepath: Path of the source file.
+    """
+
+    key, (size, mtime) = self._stat(filepath)
+    entry = self.sections.get(section, {}).get(key)
+    if entry is None or entry['size'] != size or entry['mtime'] != mtime:
+      return None
+
+    return entry['content']
+
+  def store(self, section, filepath, content):
+    """
+    Put C{content} imported from C{filepath} in the cache.
+
+    @type  section: C{str}
+    @param section: Name of the cache section (e.g. C{'db'}).
+
+    @type  filepath: C{str}
+    @param filepath: Path of the source file.
+
+    @type  content: picklable object
+    @param content: Content imported from C{filepath}.
+    """
+
+    key, (size, mtime) = self._stat(filepath)
+    self.sections.setdefault(section, {})[key] = {
+        'size' : size,
+        'mtime' : mtime,
+        'content' : content
+        }
+    self.dirty = True
+
+  def prune(self, section, filepaths):
+    """
+    Remove entries of C{section} whose source files are not listed in
+    C{filepaths} (i.e. were removed from content directory).
+    """
+
+    keep = set(os.path.abspath(f) for f in filepaths)
+    entries = self.sections.get(section, {})
+    for key in entries.keys():
+      if key not in keep:
+        del entries[key]
+        self.dirty = True
+
+  def save(self):
+    """
+    Write snapshot to disk if anything changed. The snapshot is written to
+    a temporary file first and then moved in place, so an interrupted write
+    never leaves a corrupted snapshot behind.
+    """
+
+    if not self.dirty:
+      return
+
+    data = {'version' : ContentCache.VERSION, 'sections' : self.sections}
+    tmp_path = self.path + '.tmp'
+    try:
+      f = open(tmp_path, 'wb')
+      try:
+        cPickle.dump(data, f, cPickle.HIGHEST_PROTOCOL)
+      finally:
+        f.close()
+      if os.name == 'nt' and os.path.exists(self.path):
+        os.remove(self.path)
+      os.rename(tmp_path, self.path)
+    except (IOError, OSError), e:
+      log.debug('could not write content cache %s: %s' % (self.path, e))
+      return
+
+    self.dirty = False
@@ -6,19 +6,39 @@
 '''
 
 import os
+import time
 import pygame
 import xml.dom.minidom
 
 from xmlmanager import XMLManager
+from profiler import StartupProfiler
+
+# parameters of hitbox shapes, offsets are relative to sprite's rect
+HITBOX_SHAPES = {
+  'circle' : ('x', 'y', 'r'),
+  'rect' : ('x', 'y', 'w', 'h'),
+}
 
 class DBManager(XMLManager):
   """
   This class is responsible for importing game content configuration.
+
+  Contents of a class consist of graphics resources (C{'gfx'}), properties
+  (C{'props'}) and optional hitbox (C{'hitbox'}, None if not defined) -
+  tuple of shapes used to test collisions of class instances instead of
+  their rects. A shape is a tuple of its kind (key of C{HITBOX_SHAPES})
+  followed by its parameters, e.g. C{('circle', x, y, r)}.
+
+  Contents may also declare composite images (C{'variants'}, None if not
+  defined) - dictionary mapping variant name to tuple of parts drawn one
+  over another. A part is a tuple C{(resource, state, x, y)} giving state of
+  a resource of the class and its offset in the composed image (see
+  C{GfxManager.get_variants}).
   """
 
   content = {}
 
-  def import_db(self, dir, purge = False):
+  def import_db(self, dir, purge = False, cache = None, pool = None):
     '''
     Import all files from specified directory and put contents
     in static variable C{DBManager.content}.
@@ -28,6 +48,13 @@ class DBManager(XMLManager):
 
     @type  purge: C{boolean}
     @param purge: set to True to empty previous C{content}
+
+    @type  cache: C{L{ContentCache}} or C{None}
+    @param cache: if given, files which did not change since they were
+    cached are not parsed again; freshly parsed files are put in the cache
+
+    @type  pool: C{multiprocessing.Pool} or C{None}
+    @param pool: if given, files are parsed by worker processes of the pool
     '''
 
     if not dir:
@@ -36,15 +63,128 @@ class DBManager(XMLManager):
     if purge:
       self.reset()
     
+    paths = []
+    contents = {}
+    todo = []
     files = os.listdir(dir)
     for f in files:
       ff = os.path.join(dir, f)
       if os.path.isfile(ff):
-        DBManager.content[f.rsplit('.', 1)[0]] = self.import_file(ff)
+        paths.append(ff)
+
+        content = cache.lookup('db', ff) if cache is not None else None
+        if content is None:
+          todo.append(ff)
+        else:
+          contents[ff] = content
+
+    if pool is not None and len(todo) > 1:
+      parsed = pool.map(_import_file, todo)
+    else:
+      parsed = map(_import_file, todo)
+
+    for ff, (content, seconds) in zip(todo, parsed):
+      StartupProfiler.record('xml', ff, seconds)
+      if cache is not None:
+        cache.store('db', ff, content)
+      contents[ff] = content
+
+    for ff in paths:
+      DBManager.content[os.path.basename(ff).rsplit('.', 1)[0]] = contents[ff]
+
+    if cache is not None:
+      cache.prune('db', paths)
 
   def import_file(self, filepath):
     '''Import contents of a single file and return them as a dictionary.'''
 
+    if self._get_backend() == 'iterparse':
+      return self._import_file_iterparse(filepath)
+
+    return self._import_file_minidom(filepath)
+
+  def _import_file_iterparse(self, filepath):
+    '''
+    Import contents of a single file in one streaming pass. Only
+    the first C{gfx} and C{properties} elements are taken into account,
+    exactly as in C{L{_import_file_minidom}}.
+    '''
+
+    gfx = None
+    props = None
+    hitbox = None
+    variants = None
+    in_gfx = in_props = in_hitbox = False
+    resource = None
+    variant = None
+
+    for event, elem in self.iterparse(filepath):
+      tag = elem.tag
+      if event == 'start':
+        if tag == 'gfx' and gfx is None:
+          gfx = {}
+          in_gfx = True
+        elif tag == 'properties' and props is None:
+          props = {}
+          in_props = True
+        elif tag == 'hitbox' and hitbox is None:
+          hitbox = []
+          in_hitbox = True
+        elif in_hitbox:
+          hitbox.append(self._hitbox_shape(filepath, tag,
+                                           lambda a: self.get_attr(elem, a)))
+        elif tag == 'variants' and variants is None:
+          variants = {}
+        elif tag == 'variant' and variants is not None:
+          variant = variants[self.get_attr(elem, 'name')] = []
+        elif tag == 'part' and variant is not None:
+          variant.append(self._variant_part(filepath,
+                                            lambda a: self.get_attr(elem, a)))
+        elif tag == 'resource' and in_gfx:
+          name = self.get_attr(elem, 'name')
+
+          resource = gfx[name] = {}
+          resource['file'] = self.get_attr(elem, 'file')
+          resource['state_w'] = (int)(self.get_attr(elem, 'state_w'))
+          resource['state_h'] = (int)(self.get_attr(elem, 'state_h'))
+          resource['states'] = {}
+        elif tag == 'state' and resource is not None:
+          state_name = self.get_attr(elem, 'name')
+
+          off = { 'x_off' : (int)(self.get_attr(elem, 'x_off')), 'y_off' : (int)(self.get_attr(elem, 'y_off')) }
+
+          resource['states'][state_name] = off
+        elif tag == 'prop' and in_props:
+          name = self.get_attr(elem, 'name')
+          type = self.get_attr(elem, 'type')
+
+          props[name] = self.convert_prop(self.get_attr(elem, 'value'), type)
+      else:
+        if tag == 'gfx':
+          in_gfx = False
+        elif tag == 'properties':
+          in_props = False
+        elif tag == 'hitbox':
+          in_hitbox = False
+        elif tag == 'variant':
+          variant = None
+        elif tag == 'resource':
+          resource = None
+
+        elem.clear()
+
+    if gfx is None or props is None:
+      raise ValueError("%s: missing 'gfx' or 'properties' element" % filepath)
+
+    hitbox = tuple(hitbox or ()) or None
+    variants = self._check_variants(filepath, gfx, variants)
+
+    return { 'gfx' : gfx, 'props' : props, 'hitbox' : hitbox,
+             'variants' : variants }
+
+  def _import_file_minidom(self, filepath):
+    '''Import contents of a single file using DOM.'''
+
     dom = xml.dom.minidom.parse(filepath)
     dom_gfx = dom.getElementsByTagName('content')[0]. \
                   getElementsByTagName('gfx')[0]. \
@@ -74,7 +214,83 @@ class DBManager(XMLManager):
 
     props = self.get_props(dom_props_container, 'prop')
 
-    return { 'gfx' : gfx, 'props' : props }
+    hitbox = []
+    dom_hitbox = dom.getElementsByTagName('content')[0]. \
+                     getElementsByTagName('hitbox')
+    if dom_hitbox:
+      for node in dom_hitbox[0].childNodes:
+        if node.nodeType == node.ELEMENT_NODE:
+          hitbox.append(self._hitbox_shape(filepath, node.tagName,
+                                           node.getAttribute))
+
+    hitbox = tuple(hitbox) or None
+
+    variants = None
+    dom_variants = dom.getElementsByTagName('content')[0]. \
+                       getElementsByTagName('variants')
+    if dom_variants:
+      variants = {}
+      for dom_variant in dom_variants[0].getElementsByTagName('variant'):
+        variants[dom_variant.getAttribute('name')] = \
+            [self._variant_part(filepath, node.getAttribute)
+             for node in dom_variant.getElementsByTagName('part')]
+
+    variants = self._check_variants(filepath, gfx, variants)
+
+    return { 'gfx' : gfx, 'props' : props, 'hitbox' : hitbox,
+             'variants' : variants }
+
+  def _hitbox_shape(self, filepath, tag, get_attr):
+    '''
+    Return hitbox shape described by element C{tag} whose attributes are
+    returned by C{get_attr}. Raise C{ValueError} if the shape is unknown or
+    its parameters are invalid.
+    '''
+
+    if tag not in HITBOX_SHAPES:
+      raise ValueError("%s: unknown hitbox shape '%s'" % (filepath, tag))
+
+    try:
+      return (str(tag),) + tuple(int(get_attr(a)) for a in HITBOX_SHAPES[tag])
+    except ValueError:
+      raise ValueError("%s: invalid parameters of hitbox shape '%s'" %
+                       (filepath, tag))
+
+  def _variant_part(self, filepath, get_attr):
+    '''
+    Return part of a composite image described by element whose attributes
+    are returned by C{get_attr}. Raise C{ValueError} if its offset is
+    invalid.
+    '''
+
+    try:
+      return (get_attr('resource'), get_attr('state'),
+              int(get_attr('x') or 0), int(get_attr('y') or 0))
+    except ValueError:
+      raise ValueError("%s: invalid offset of variant part" % filepath)
+
+  def _check_variants(self, filepath, gfx, variants):
+    '''
+    Return C{variants} with parts converted to tuples or None if there are
+    none. Raise C{ValueError} if a variant is empty or a part refers to
+    unknown resource or state.
+    '''
+
+    if not variants:
+      return None
+
+    for name, parts in variants.items():
+      if not parts:
+        raise ValueError("%s: variant '%s' has no parts" % (filepath, name))
+
+      for res, state, x, y in parts:
+        if res not in gfx or state not in gfx[res]['states']:
+          raise ValueError("%s: variant '%s' refers to unknown state '%s' "
+                           "of resource '%s'" % (filepath, name, state, res))
+
+      variants[name] = tuple(parts)
+
+    return variants
 
   def get(self, class_name = None):
     '''
@@ -104,3 +320,15 @@ class DBManager(XMLManager):
   def reset(self):
     '''Reset the inner classes' configuration dictionary.'''
     DBManager.content = {}
+
+
+def _import_file(filepath):
+  '''
+  Import contents of a single file. Module level entry point used (also by
+  worker processes) by C{DBManager.import_db}. Return pair: imported
+  contents and time spent on parsing in seconds.
+  '''
+
+  t = time.time()
+  content = DBManager().import_file(filepath)
+  return content, time.time() - t
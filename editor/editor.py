@@ -5,6 +5,9 @@ import sys
 import os
 from PyQt4.QtGui import *
 
+# game modules (content managers, movers) live in the parent directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
 from mainwindow import MainWindow
 
 if __name__ == '__main__':
@@ -13,10 +16,7 @@ if __name__ == '__main__':
 
   app = QApplication(sys.argv)
 
-  # temp
-  sys.path.append('../')
   from dbmanager import DBManager
-  #
 
   window = MainWindow(DBManager())
   window.show()
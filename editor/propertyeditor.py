@@ -6,12 +6,13 @@ from PyQt4.QtGui import *
 
 from newpropertydialog import NewPropertyDialog
 
+from registry import Registry
+import mover  # registers movers
+
 
 prop_opts = {# option selectible props
              'object_cls_name': ['EnemyInterceptor', 'MidgetBeamShip'],
-             'mover_cls_name':  ['RandomMover', 'ZigZagMover', 'CircularMover',
-                                 'LinearMover', 'LinearPlayerTargetingMover',
-                                 'SeekingMover'],
+             'mover_cls_name':  Registry.names('mover'),
              'bonus_cls_name':  ['RechargeBonus', 'SuperShieldBonus',
                                  'ShieldUpgradeBonus'],
              'group':           ['enemies', 'ship', 'enemy_projectiles',
@@ -27,13 +28,13 @@ select_only_props = 'group', 'mover_cls_name', \
 primitive_type_props = 'posx', 'posy', 'time'
 
 # mover/bonus-type: {param_one: default_value, param_two: default_value...}
-mover_params = {'RandomMover':   {'period': 130},
-                'ZigZagMover':   {'radius': 80},
-                'CircularMover': {'radius': 80},
-                'LinearMover':   {'dir': 0},
-                'LinearPlayerTargetingMover': {'vertical_div': 0.3},
-                'SeekingMover':  {}
-               }
+mover_params = dict((name, {}) for name in Registry.names('mover'))
+mover_params.update({'RandomMover':   {'period': 130},
+                     'ZigZagMover':   {'radius': 80},
+                     'CircularMover': {'radius': 80},
+                     'LinearMover':   {'dir': 0},
+                     'LinearPlayerTargetingMover': {'vertical_div': 0.3}
+                    })
 bonus_params = {'RechargeBonus': {'power': 10},
                 'SuperShieldBonus': {},
                 'ShieldUpgradeBonus': {}
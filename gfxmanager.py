@@ -5,32 +5,403 @@
 '''
 
 import os
+import time
 import pygame
+from collections import OrderedDict
+
+from profiler import StartupProfiler
+
+import logging
+log = logging.getLogger('GfxManager')
 
 class GfxManager:
+  '''
+  Graphics resources of game classes. Resources are either loaded eagerly
+  (all at once by C{L{import_gfx}}) or lazily - when a class is requested
+  by C{L{get}} for the first time. Decoded images are shared by path
+  between all classes using them.
+
+  Every state of a resource is sliced once, when its class is loaded, into
+  a subsurface of the decoded image (C{'frames'}) shared by all sprites of
+  the class. Sprites show a state by pointing their C{image} at its frame,
+  so frames must not be modified. Variants of classes composed of several
+  resource states (see C{L{get_variants}}) are pre-composed the same way.
+
+  In lazy mode total size of decoded images may be limited by C{budget}.
+  When the budget is exceeded least recently used classes which were not
+  requested since the beginning of current stage (see C{L{begin_stage}})
+  are evicted.
+
+  @type content: C{dict}
+  @cvar content: Resources of loaded classes.
+
+  @type lazy: C{bool}
+  @cvar lazy: Tells whether resources are loaded on demand.
+
+  @type budget: C{int} or C{None}
+  @cvar budget: Maximal size of decoded images in bytes (lazy mode only).
+    C{None} means no limit.
+
+  @type resident: C{int}
+  @cvar resident: Current size of decoded images in bytes.
+
+  @type composites: C{dict}
+  @cvar composites: Composed variants of loaded classes which declare any.
+  '''
+
   content = {}
+  composites = {}
+
+  lazy = False
+  budget = None
+  resident = 0
+
+  _conf = {}
+  _gfx_dir = None
+  _atlas = None
+
+  _surfaces = {}
+  _users = {}
+  _lru = OrderedDict()
+  _stage_classes = set()
+  _blanks = {}
+
+  def import_gfx(self, conf, gfx_dir, pool = None, atlas = None,
+                 lazy = False, budget = None):
+    '''
+    Load graphics resources of all classes described by C{conf}. Each
+    image file is decoded only once, even if it is used by many classes.
+
+    @type  conf: C{dict}
+    @param conf: Classes' configuration as returned by C{DBManager.get}.
+
+    @type  gfx_dir: C{str}
+    @param gfx_dir: Directory containing image files.
+
+    @type  pool: C{multiprocessing.pool.ThreadPool} or C{None}
+    @param pool: If given, image files are decoded by threads of the pool.
+    Conversion to display format is always done in the calling thread.
+
+    @type  atlas: C{dict} or C{None}
+    @param atlas: Placement table of texture atlas (see
+    C{L{atlas.AtlasTable}}). Resources whose states lie within regions
+    packed into atlas sheets are served from the sheets, the rest is loaded
+    from separate files.
+
+    @type  lazy: C{bool}
+    @param lazy: If True nothing is loaded now, classes are loaded on their
+    first request.
+
+    @type  budget: C{int} or C{None}
+    @param budget: Maximal size of decoded images in bytes (lazy mode only).
+    '''
 
-  def import_gfx(self, conf, gfx_dir):
     if not gfx_dir:
       raise Exception('GfxManager error: no graphics drectory specified')
-  
-    for class_name in conf:
-      GfxManager.content[class_name] = {}
 
+    GfxManager._conf = conf
+    GfxManager._gfx_dir = gfx_dir
+    GfxManager._atlas = atlas
+    GfxManager.lazy = lazy
+    GfxManager.budget = budget if lazy else None
+
+    if lazy:
+      return
+
+    paths = []
+    for class_name in conf:
       gfx = conf[class_name]['gfx']
       for res in gfx:
-        f = os.path.join(gfx_dir, gfx[res]['file'])
+        f = os.path.join(gfx_dir, self._source(gfx[res], atlas))
+        if f not in paths and f not in GfxManager._surfaces:
+          paths.append(f)
+
+    if pool is not None and len(paths) > 1:
+      surfaces = pool.map(_load_image, paths)
+    else:
+      surfaces = map(_load_image, paths)
+
+    for f, (surface, seconds) in zip(paths, surfaces):
+      StartupProfiler.record('decode', f, seconds)
+      self._add_surface(f, self._convert(f, surface))
+
+    for class_name in conf:
+      self._load_class(class_name)
+
+  def _convert(self, path, surface):
+    '''
+    Return C{surface} loaded from C{path} converted to display format.
+    '''
+
+    with StartupProfiler.measure('convert', path):
+      return surface.convert_alpha()
+
+  def _add_surface(self, path, surface):
+    '''
+    Register decoded image C{surface} loaded from C{path}.
+    '''
+
+    GfxManager._surfaces[path] = surface
+    GfxManager._users[path] = set()
+    GfxManager.resident += surface.get_pitch() * surface.get_height()
+
+  def _load_class(self, class_name):
+    '''
+    Build resources of C{class_name}. Images which are not decoded yet
+    are loaded now.
+    '''
+
+    GfxManager.content[class_name] = {}
+
+    gfx = GfxManager._conf[class_name]['gfx']
+    for res in gfx:
+      f = os.path.join(GfxManager._gfx_dir,
+                       self._source(gfx[res], GfxManager._atlas))
+      if f not in GfxManager._surfaces:
+        surface, seconds = _load_image(f)
+        StartupProfiler.record('decode', f, seconds)
+        self._add_surface(f, self._convert(f, surface))
+      GfxManager._users[f].add(class_name)
+
+      size = gfx[res]['state_w'], gfx[res]['state_h']
+      image = GfxManager._surfaces[f]
+      states = self._states(gfx[res], GfxManager._atlas)
+      areas, frames = self._slice(image, states, size,
+                                  '%s/%s' % (class_name, res))
+      GfxManager.content[class_name][res] = {
+          'image' : image,
+          'states' : states,
+          'areas' : areas,
+          'frames' : frames,
+          'masks' : {},
+          'w' : size[0],
+          'h' : size[1],
+          'size' : size
+        }
+
+    variants = GfxManager._conf[class_name].get('variants')
+    if variants:
+      GfxManager.composites[class_name] = \
+          self._compose(GfxManager.content[class_name], variants)
+
+  def _compose(self, resources, variants):
+    '''
+    Compose images of C{variants} from frames of C{resources} of a class.
+    Return them as a resource-like dictionary with keys C{'frames'} and
+    C{'masks'} (see C{L{mask}}).
+    '''
+
+    frames = {}
+    for name, parts in variants.items():
+      w = max(x + resources[res]['w'] for res, state, x, y in parts)
+      h = max(y + resources[res]['h'] for res, state, x, y in parts)
+
+      image = pygame.Surface((w, h), pygame.SRCALPHA,
+                             resources[parts[0][0]]['image'])
+      for res, state, x, y in parts:
+        image.blit(resources[res]['frames'][state], (x, y))
+      frames[name] = image
 
-        size = gfx[res]['state_w'], gfx[res]['state_h']
-        GfxManager.content[class_name][res] = {
-            'image' : pygame.image.load(f).convert_alpha(),
-            'states' : gfx[res]['states'],
-            'w' : size[0],
-            'h' : size[1],
-            'size' : size 
-          }
+    return { 'frames' : frames, 'masks' : {} }
+
+  def _unload_class(self, class_name):
+    '''
+    Forget resources of C{class_name}. Images not used by any other loaded
+    class are released. Sprites which already hold the resources are not
+    affected.
+    '''
+
+    del GfxManager.content[class_name]
+    GfxManager.composites.pop(class_name, None)
+    del GfxManager._lru[class_name]
+
+    for path, users in GfxManager._users.items():
+      users.discard(class_name)
+      if not users:
+        surface = GfxManager._surfaces.pop(path)
+        del GfxManager._users[path]
+        GfxManager.resident -= surface.get_pitch() * surface.get_height()
+
+  def _evict(self):
+    '''
+    Unload least recently used classes not used by current stage until
+    resident images fit in C{budget}.
+    '''
+
+    if GfxManager.budget is None:
+      return
+
+    for class_name in GfxManager._lru.keys():
+      if GfxManager.resident <= GfxManager.budget:
+        break
+
+      if class_name not in GfxManager._stage_classes:
+        self._unload_class(class_name)
+
+  def begin_stage(self):
+    '''
+    Mark beginning of a new stage. Classes requested before are candidates
+    for eviction from now on.
+    '''
+
+    GfxManager._stage_classes = set()
+    self._evict()
+
+  def _placement(self, res, atlas):
+    '''
+    Return atlas placement of resource C{res} or C{None} if the resource
+    is not (or not entirely) packed into atlas.
+    '''
+
+    if not atlas or res['file'] not in atlas:
+      return None
+
+    p = atlas[res['file']]
+    for off in res['states'].values():
+      if off['x_off'] < p['x'] or off['y_off'] < p['y'] or \
+          off['x_off'] + res['state_w'] > p['x'] + p['w'] or \
+          off['y_off'] + res['state_h'] > p['y'] + p['h']:
+        return None
+
+    return p
+
+  def _source(self, res, atlas):
+    '''
+    Return name of the image file resource C{res} is loaded from.
+    '''
+
+    p = self._placement(res, atlas)
+    return res['file'] if p is None else p['sheet']
+
+  def _states(self, res, atlas):
+    '''
+    Return states of resource C{res} with offsets remapped to atlas sheet
+    coordinates if the resource is packed into atlas.
+    '''
+
+    p = self._placement(res, atlas)
+    if p is None:
+      return res['states']
+
+    states = {}
+    for name, off in res['states'].items():
+      states[name] = {'x_off' : off['x_off'] - p['x'] + p['dest_x'],
+                      'y_off' : off['y_off'] - p['y'] + p['dest_y']}
+    return states
+
+  def _slice(self, image, states, size, owner):
+    '''
+    Return areas of C{image} occupied by C{states} (as C{pygame.Rect}s) and
+    subsurfaces of C{image} showing the states, both by state name.
+
+    States lying partly outside the image (reported as errors of resource
+    C{owner}) get frames of their own, transparent outside the image.
+    '''
+
+    areas = {}
+    frames = {}
+    bounds = image.get_rect()
+    for name, off in states.items():
+      area = pygame.Rect((off['x_off'], off['y_off']), size)
+      areas[name] = area
+
+      clipped = area.clip(bounds)
+      if clipped == area:
+        frames[name] = image.subsurface(area)
+        continue
+
+      log.warning('%s: state %s (%d, %d, %d, %d) exceeds image size %dx%d' %
+                  ((owner, name) + tuple(area) + bounds.size))
+      frames[name] = pygame.Surface(size, pygame.SRCALPHA, image)
+      if clipped.w and clipped.h:
+        frames[name].blit(image.subsurface(clipped),
+                          (clipped.x - area.x, clipped.y - area.y))
+    return areas, frames
+
+  def blank(self, size):
+    '''
+    Return fully transparent surface of C{size} shared by all sprites
+    which show nothing. It must not be modified.
+    '''
+
+    if size not in GfxManager._blanks:
+      GfxManager._blanks[size] = pygame.Surface(size, pygame.SRCALPHA, 32)
+    return GfxManager._blanks[size]
+
+  def mask(self, res, state):
+    '''
+    Return collision mask of C{state} of resource C{res} (a resource of
+    a class as returned by C{L{get}}). The mask is built on the first
+    request and shared by all sprites of the class. Parts of the state
+    lying outside the image are empty.
+    '''
+
+    masks = res['masks']
+    if state not in masks:
+      if 'areas' in res:
+        masks[state] = _area_mask(res['image'], res['areas'][state])
+      else:
+        # composed variant (see _compose)
+        masks[state] = pygame.mask.from_surface(res['frames'][state])
+    return masks[state]
 
   def get(self, class_name = None):
-    '''Returns gfx for a specific class or for all classes if no classname is given'''
+    '''
+    Returns gfx for a specific class or for all classes if no classname is
+    given. In lazy mode class resources are loaded on first request and
+    only loaded classes are returned if no classname is given.
+    '''
+
+    if not class_name:
+      return GfxManager.content
+
+    if GfxManager.lazy:
+      if class_name not in GfxManager.content:
+        self._load_class(class_name)
+      else:
+        del GfxManager._lru[class_name]
+      GfxManager._lru[class_name] = None
+      GfxManager._stage_classes.add(class_name)
+
+      self._evict()
+
+    return GfxManager.content[class_name]
+
+
+  def get_variants(self, class_name):
+    '''
+    Return composed variants of C{class_name} or None if the class declares
+    none (see C{DBManager}). Variants are returned as a dictionary whose
+    key C{'frames'} maps variant name to its image, shared by all sprites
+    of the class. The class has to be loaded (see C{L{get}}).
+    '''
+
+    return GfxManager.composites.get(class_name)
+
+
+def _load_image(path):
+  '''
+  Decode image file C{path}. Return pair: decoded surface and time spent on
+  decoding in seconds.
+  '''
+
+  t = time.time()
+  surface = pygame.image.load(path)
+  return surface, time.time() - t
+
+
+def _area_mask(image, area):
+  '''
+  Return collision mask of C{area} of C{image}. Parts of the area lying
+  outside the image are empty.
+  '''
+
+  clipped = area.clip(image.get_rect())
+  if clipped == area:
+    return pygame.mask.from_surface(image.subsurface(area))
 
-    return GfxManager.content[class_name] if class_name else GfxManager.content
+  mask = pygame.mask.Mask(area.size)
+  if clipped.w and clipped.h:
+    mask.draw(pygame.mask.from_surface(image.subsurface(clipped)),
+              (clipped.x - area.x, clipped.y - area.y))
+  return mask
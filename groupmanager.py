@@ -7,8 +7,19 @@
 import os
 import pygame
 
+from spatial import SpatialHash
+
 class GroupManager:
+  """
+  @type content: C{dict}
+  @cvar content: Groups by name.
+
+  @type indexes: C{dict}
+  @cvar indexes: Maps C{id} of an indexed group to its C{L{SpatialHash}}.
+  """
+
   content = {}
+  indexes = {}
 
   def add(self, name, cls_name = 'Group'):
     """
@@ -19,7 +30,7 @@ class GroupManager:
     @param name: Name of the group to be created.
     """
 
-    cls = eval('pygame.sprite.' + cls_name)
+    cls = getattr(pygame.sprite, cls_name)
 
     GroupManager.content[name] = cls()
     return GroupManager.content[name]
@@ -37,11 +48,86 @@ class GroupManager:
 
     return None
   
+  def index(self, name, cell_size = 64, margin = 16):
+    """
+    Keep a C{L{SpatialHash}} of group C{name} for collision queries
+    (see C{L{spritecollide}}). Return the index.
+    """
+
+    group = GroupManager.content[name]
+    index = SpatialHash(group, cell_size, margin)
+    GroupManager.indexes[id(group)] = index
+    return index
+
+  def get_index(self, group):
+    """
+    Return C{L{SpatialHash}} of C{group} or None if the group is not indexed.
+    """
+
+    return GroupManager.indexes.get(id(group))
+
+  def update_indexes(self):
+    """
+    Rebuild indexes of all indexed groups. Called once per frame by
+    C{L{CollisionPhase}}.
+    """
+
+    for index in GroupManager.indexes.itervalues():
+      index.rebuild()
+
+  def index_of(self, group):
+    """
+    Return index of C{group} or a temporary index built on the spot if the
+    group is not indexed.
+    """
+
+    index = GroupManager.indexes.get(id(group))
+    if index is None:
+      index = SpatialHash(group)
+      index.rebuild()
+    return index
+
+  def nearest(self, group, pos, accept = None):
+    """
+    Return sprite of C{group} closest to C{pos} (see
+    C{L{SpatialHash.nearest}}) or None.
+    """
+
+    return self.index_of(group).nearest(pos, accept)
+
+  def within(self, group, pos, radius):
+    """
+    Return sprites of C{group} closer to C{pos} than C{radius} (see
+    C{L{SpatialHash.within}}).
+    """
+
+    return self.index_of(group).within(pos, radius)
+
+  def raycast(self, group, pos, down = True):
+    """
+    Return the first sprite of C{group} hit by a vertical ray cast from
+    C{pos} (see C{L{SpatialHash.raycast}}) or None.
+    """
+
+    return self.index_of(group).raycast(pos, down)
+
+  def spritecollide(self, sprite, group, dokill = False, collided = None):
+    """
+    Same as C{pygame.sprite.spritecollide} but uses index of C{group} if
+    there is one.
+    """
+
+    index = GroupManager.indexes.get(id(group))
+    if index is None:
+      return pygame.sprite.spritecollide(sprite, group, dokill, collided)
+    return index.spritecollide(sprite, dokill, collided)
+
   @classmethod
   def reset(cls):
     '''Delete all groups and their content.
     '''
     cls.content.clear()
+    cls.indexes.clear()
 
   def __getitem__(self, x):
     return self.get(x)
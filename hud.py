@@ -18,7 +18,7 @@ class Hud(object):
 
     self.g_hud = pygame.sprite.Group()
 
-    self.label_font = pygame.font.Font('fonts/HookedUp.ttf', 20)
+    self.label_font = widgets.load_font(*widgets.LABEL_FONT)
 
     pbar_length = screen_size[1] - 2*6 - self.label_font.get_height()
       # height - 2*label_margin - label_height
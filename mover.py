@@ -14,6 +14,7 @@ current position, second one is object's maximal speed and third one is a
 dictionary containing parameters specific for different classes.
 """
 
+import sys
 import pygame
 import random
 import math
@@ -21,6 +22,9 @@ import math
 from base import AGObject
 from clock import Clock
 from groupmanager import GroupManager
+from registry import Registry
+from moverbatch import MoverBatch, LinearKernel, RandomKernel, ZigZagKernel, \
+                       CircularKernel, PlayerTargetingKernel, SeekingKernel
 
 from functions import sgn, deg2rad, rad2deg, normalize_rad
 
@@ -30,8 +34,15 @@ class Mover(AGObject):
 
   @type clock: integer
   @ivar clock: Clock instance
+
+  @type _table: object
+  @ivar _table: Table of C{L{MoverBatch}} keeping state of the mover or None
+    if the mover updates itself.
   """
 
+  _table = None
+  _slot = None
+
   def __init__(self):
     """
     Crate mover instance and initialize its clock. Should not be used
@@ -46,12 +57,43 @@ class Mover(AGObject):
 
   def update(self):
     """
-    Return updated object's coordinates in a tuple. Needs to be overriden
-    by child classes.
+    Return updated object's coordinates in a tuple. Movers whose class has
+    a kernel join C{MoverBatch.current} batch (if any) and from the next
+    frame on only take position computed by it, others compute it with
+    C{L{_update}}.
     """
- 
+
+    table = self._table
+    if table is not None and table.batch is not MoverBatch.current:
+      # batch of a finished level
+      table = self._table = self._slot = None
+
+    if table is not None:
+      pos = table.pull(self)
+      if pos is not None:
+        return pos
+    elif MoverBatch.current is not None:
+      MoverBatch.current.add(self)
+
+    return self._update()
+
+  def _update(self):
+    """
+    Compute updated object's coordinates. Needs to be overriden by child
+    classes.
+    """
+
     return 0, 0
 
+  def _unbatch(self):
+    """
+    Leave the batch (if any) so that state set by the caller is not
+    overwritten. The mover joins it again on the next update.
+    """
+
+    if self._table is not None:
+      self._table.discard(self)
+
 
 class RandomMover(Mover):
   """
@@ -97,7 +139,7 @@ class RandomMover(Mover):
 
     self.time = self.period
 
-  def update(self):
+  def _update(self):
     if self.time >= self.period:
       self.dir = random.randint(0, 359)
       self.time -= self.period
@@ -162,7 +204,7 @@ class ZigZagMover(Mover):
 
     self.time = 0
 
-  def update(self):
+  def _update(self):
     k = math.floor(self.time / self.period / 1000.)
     x = self.radius * math.sin(self.ang_speed * self.time / 1000.) 
     y = self.radius * math.cos(self.ang_speed * self.time / 1000. % math.pi +
@@ -239,7 +281,7 @@ class CircularMover(Mover):
 
     self.time = 0
 
-  def update(self):
+  def _update(self):
     if self.time <= self.init_time:
       x = self.time * self.init_speed * math.sin(self.init_dir) / 1000.
       y = self.time * self.init_speed * math.cos(self.init_dir) / 1000.
@@ -292,6 +334,16 @@ class LinearMover(Mover):
     self._setattrs(('dir'), params)
     self.dir = deg2rad(self.dir)
 
+  def reset(self, pos, params):
+    """
+    Restart movement from C{pos} with new C{params} ('dir' is required).
+    Used when the owner is reused (see C{L{ObjectPool}}).
+    """
+
+    self._unbatch()
+    self.pos = list(pos)
+    self.dir = deg2rad(params['dir'])
+
   def get_dir(self):
     """
     Return current direction in degrees.
@@ -299,7 +351,7 @@ class LinearMover(Mover):
 
     return rad2deg(self.dir)
 
-  def update(self):
+  def _update(self):
     try:
       delta_pos = self.clock.frame_span() * self.speed / 1000.
 
@@ -336,7 +388,7 @@ class LinearPlayerTargetingMover(Mover):
     ships = GroupManager().get('ship').sprites()
     self.target = None if len(ships) == 0 else ships[0]
 
-  def update(self):
+  def _update(self):
     delta_pos = self.clock.frame_span() * self.speed / 1000.
     d = self.target.pos[0] - self.pos[0]
 
@@ -388,6 +440,19 @@ class SeekingMover(Mover):
 
     self.target = None
 
+  def reset(self, pos, params):
+    """
+    Restart movement from C{pos} with new C{params} ('dir' and 'ang_speed'
+    are required) and no target. Used when the owner is reused (see
+    C{L{ObjectPool}}).
+    """
+
+    self._unbatch()
+    self.pos = list(pos)
+    self.dir = deg2rad(params['dir'])
+    self.ang_speed = deg2rad(params['ang_speed'])
+    self.target = None
+
   def set_target(self, target):
     """
     Set target to follow.
@@ -435,7 +500,7 @@ class SeekingMover(Mover):
 
     self.dir = normalize_rad(self.dir + delta_dir)
 
-  def update(self):
+  def _update(self):
     delta_pos = self.clock.frame_span() * self.speed / 1000.
     
     self._update_dir()
@@ -445,3 +510,12 @@ class SeekingMover(Mover):
       
     return round(self.pos[0]), round(self.pos[1])
 
+
+MoverBatch.register(RandomMover, RandomKernel())
+MoverBatch.register(ZigZagMover, ZigZagKernel())
+MoverBatch.register(CircularMover, CircularKernel())
+MoverBatch.register(LinearMover, LinearKernel())
+MoverBatch.register(LinearPlayerTargetingMover, PlayerTargetingKernel())
+MoverBatch.register(SeekingMover, SeekingKernel())
+
+Registry.register_module(sys.modules[__name__], 'mover', Mover)
@@ -0,0 +1,393 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Vectorized update of movers.
+'''
+
+import math
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from clock import Clock
+
+
+def _round(a):
+  '''Round half away from zero, as C{round} does.'''
+
+  return numpy.sign(a) * numpy.floor(numpy.abs(a) + 0.5)
+
+
+class Kernel(object):
+  """
+  Vectorized implementation of C{update} of a single mover class. State of
+  movers is kept in arrays named by C{fields}.
+
+  The base kernel matches C{Mover}: movers stay at C{(0, 0)}.
+
+  @type fields: C{tuple}
+  @cvar fields: Names of state arrays.
+  """
+
+  fields = ('x', 'y')
+
+  def gather(self, m):
+    """
+    Return values of C{fields} read from mover C{m}. By default the mover
+    is put at C{(0, 0)}.
+    """
+
+    return (0, 0)
+
+  def snapshot(self, a, movers):
+    """
+    Refresh arrays describing movers' surroundings (e.g. target positions)
+    before C{L{advance}}. Does nothing by default.
+    """
+
+    pass
+
+  def advance(self, a, dt):
+    """
+    Advance movers with state arrays C{a} (dictionary by field name) by
+    C{dt} miliseconds. Return arrays of positions returned to the owners.
+    By default movers do not move.
+    """
+
+    return a['x'], a['y']
+
+  def write(self, m, s, i):
+    """
+    Write state of mover C{m} kept at index C{i} of lists C{s} (dictionary
+    by field name) back to its attributes. Return position for the owner
+    or None to return position computed by C{L{advance}}. Does nothing by
+    default.
+    """
+
+    pass
+
+
+class LinearKernel(Kernel):
+  fields = ('x', 'y', 'sin', 'cos', 'speed')
+
+  def gather(self, m):
+    return (m.pos[0], m.pos[1], math.sin(m.dir), math.cos(m.dir), m.speed)
+
+  def advance(self, a, dt):
+    delta = dt * a['speed'] / 1000.
+    a['x'] += delta * a['sin']
+    a['y'] += delta * a['cos']
+    return _round(a['x']), _round(a['y'])
+
+  def write(self, m, s, i):
+    m.pos[0], m.pos[1] = s['x'][i], s['y'][i]
+
+
+class RandomKernel(Kernel):
+  fields = ('x', 'y', 'dir', 'time', 'period', 'speed')
+
+  def gather(self, m):
+    return (m.pos[0], m.pos[1], getattr(m, 'dir', 0), m.time, m.period,
+            m.speed)
+
+  def advance(self, a, dt):
+    turn = a['time'] >= a['period']
+    count = numpy.count_nonzero(turn)
+    if count:
+      a['dir'][turn] = numpy.random.randint(0, 360, count)
+      a['time'][turn] -= a['period'][turn]
+    a['time'] += dt
+
+    # deg2rad treats 0 as 180 degrees
+    rad = numpy.where(a['dir'] == 0, math.pi,
+                      numpy.mod(2 * math.pi * a['dir'] / 360, 2 * math.pi))
+    delta = dt * a['speed'] / 1000.
+    a['x'] += _round(delta * numpy.sin(rad))
+    a['y'] += _round(delta * numpy.cos(rad))
+    return a['x'], a['y']
+
+  def write(self, m, s, i):
+    m.pos[0], m.pos[1] = s['x'][i], s['y'][i]
+    m.dir = int(s['dir'][i])
+    m.time = s['time'][i]
+    return m.pos
+
+
+class ZigZagKernel(Kernel):
+  fields = ('ix', 'iy', 'x', 'y', 'radius', 'period', 'ang_speed', 'time')
+
+  def gather(self, m):
+    return (m.init_pos[0], m.init_pos[1], 0., 0., m.radius, m.period,
+            m.ang_speed, m.time)
+
+  def advance(self, a, dt):
+    t, r = a['time'], a['radius']
+    phase = a['ang_speed'] * t / 1000.
+    k = numpy.floor(t / a['period'] / 1000.)
+    x = r * numpy.sin(phase)
+    y = r * numpy.cos(numpy.mod(phase, math.pi) + math.pi)
+    a['time'] += dt
+
+    a['x'][:] = a['ix'] + x
+    a['y'][:] = a['iy'] + y + (2 * k + 1) * r
+    return _round(a['x']), _round(a['y'])
+
+  def write(self, m, s, i):
+    m.pos = s['x'][i], s['y'][i]
+    m.time = s['time'][i]
+
+
+class CircularKernel(Kernel):
+  fields = ('ix', 'iy', 'x', 'y', 'radius', 'ang_speed', 'init_speed',
+            'init_time', 'init_dir', 'time')
+
+  def gather(self, m):
+    return (m.init_pos[0], m.init_pos[1], 0., 0., m.radius, m.ang_speed,
+            m.init_speed, m.init_time, m.init_dir, m.time)
+
+  def advance(self, a, dt):
+    t = a['time']
+    entering = t <= a['init_time']
+    d = t * a['init_speed'] / 1000.
+    angle = (t - a['init_time']) * a['ang_speed'] / 1000. + a['init_dir']
+    x = numpy.where(entering, d * numpy.sin(a['init_dir']),
+                    a['radius'] * numpy.sin(angle))
+    y = numpy.where(entering, d * numpy.cos(a['init_dir']),
+                    a['radius'] * numpy.cos(angle))
+    a['time'] += dt
+
+    a['x'][:] = a['ix'] + x
+    a['y'][:] = a['iy'] + y
+    return _round(a['x']), _round(a['y'])
+
+  def write(self, m, s, i):
+    m.pos = s['x'][i], s['y'][i]
+    m.time = s['time'][i]
+
+
+class PlayerTargetingKernel(Kernel):
+  fields = ('x', 'y', 'speed', 'sin', 'cos', 'tx')
+
+  def gather(self, m):
+    dir = math.pi / 2. - m.vertical_div
+    return (m.pos[0], m.pos[1], m.speed, math.sin(dir), math.cos(dir), 0.)
+
+  def snapshot(self, a, movers):
+    a['tx'][:] = _target_coords(movers, a['x'], lambda t: t.pos)[0]
+
+  def advance(self, a, dt):
+    delta = dt * a['speed'] / 1000.
+    d = a['tx'] - a['x']
+    a['x'] += numpy.where(delta > numpy.abs(d), d * a['sin'],
+                          delta * numpy.sign(d) * a['sin'])
+    a['y'] += numpy.abs(delta * a['cos'])
+    return _round(a['x']), _round(a['y'])
+
+  def write(self, m, s, i):
+    m.pos[0], m.pos[1] = s['x'][i], s['y'][i]
+
+
+class SeekingKernel(Kernel):
+  fields = ('x', 'y', 'dir', 'speed', 'ang_speed', 'tx', 'ty', 'targeted')
+
+  def gather(self, m):
+    return (m.pos[0], m.pos[1], m.dir, m.speed, m.ang_speed, 0., 0., 0.)
+
+  def snapshot(self, a, movers):
+    tx, ty, targeted = _target_coords(movers, a['x'], lambda t: t.center,
+                                      a['y'])
+    a['tx'][:], a['ty'][:], a['targeted'][:] = tx, ty, targeted
+
+  def advance(self, a, dt):
+    two_pi = 2 * math.pi
+    dir = a['dir']
+
+    new_dir = numpy.mod(numpy.arctan2(a['tx'] - a['x'], a['ty'] - a['y']),
+                        two_pi)
+    delta_dir = new_dir - dir
+    max_delta_dir = a['ang_speed'] * dt / 1000.
+    limited = numpy.where(numpy.abs(delta_dir) < math.pi,
+                          numpy.sign(delta_dir) * max_delta_dir,
+                          -numpy.sign(delta_dir) * max_delta_dir)
+    delta_dir = numpy.where(numpy.abs(delta_dir) > max_delta_dir, limited,
+                            delta_dir)
+    dir[:] = numpy.where(a['targeted'] > 0,
+                         numpy.mod(dir + delta_dir, two_pi), dir)
+
+    delta = dt * a['speed'] / 1000.
+    a['x'] += delta * numpy.sin(dir)
+    a['y'] += delta * numpy.cos(dir)
+    return _round(a['x']), _round(a['y'])
+
+  def write(self, m, s, i):
+    m.pos[0], m.pos[1] = s['x'][i], s['y'][i]
+    m.dir = s['dir'][i]
+
+
+def _target_coords(movers, x, coords, y = None):
+  """
+  Return arrays of coordinates of targets of C{movers} (read with
+  C{coords} once per distinct target) and array telling which movers have
+  a target. Movers without target get their own position (C{x}, C{y}).
+  """
+
+  cache = {}
+  tx = x.copy()
+  ty = y.copy() if y is not None else x.copy()
+  targeted = numpy.zeros(len(movers))
+  for i, m in enumerate(movers):
+    t = m.target
+    if t is None:
+      continue
+    if id(t) not in cache:
+      cache[id(t)] = coords(t)
+    tx[i], ty[i] = cache[id(t)][0], cache[id(t)][1]
+    targeted[i] = 1
+  return tx, ty, targeted
+
+
+class _Table(object):
+  """
+  State of all batched movers of one class.
+  """
+
+  def __init__(self, batch, kernel):
+    self.batch = batch
+    self.kernel = kernel
+    self.movers = []
+    self.pending = []
+    self.arrays = dict((f, numpy.zeros(0)) for f in kernel.fields)
+    self.pulled = numpy.zeros(0, bool)
+    self.results = None
+    self.state = None
+
+  def add(self, m):
+    m._table, m._slot = self, None
+    self.pending.append(m)
+
+  def discard(self, m):
+    if m._slot is None:
+      self.pending.remove(m)
+    else:
+      self.movers[m._slot] = None
+      self.pulled[m._slot] = False
+    m._table = m._slot = None
+
+  def step(self, dt):
+    kernel = self.kernel
+
+    # drop movers whose owners did not ask for position (dead or replaced)
+    keep = numpy.flatnonzero(self.pulled)
+    for i in numpy.flatnonzero(~self.pulled).tolist():
+      m = self.movers[i]
+      if m is not None:
+        m._table = m._slot = None
+
+    movers = [self.movers[i] for i in keep.tolist()] + self.pending
+    rows = [kernel.gather(m) for m in self.pending]
+    for j, f in enumerate(kernel.fields):
+      kept = self.arrays[f][keep]
+      new = numpy.array([r[j] for r in rows], 'f8')
+      self.arrays[f] = numpy.concatenate((kept, new))
+
+    for i, m in enumerate(movers):
+      m._slot = i
+    self.movers = movers
+    self.pending = []
+    self.pulled = numpy.zeros(len(movers), bool)
+
+    if not movers:
+      self.results = self.state = None
+      return
+
+    kernel.snapshot(self.arrays, movers)
+    rx, ry = kernel.advance(self.arrays, dt)
+    self.results = zip(rx.tolist(), ry.tolist())
+    self.state = dict((f, a.tolist()) for f, a in self.arrays.iteritems())
+
+  def pull(self, m):
+    i = m._slot
+    if i is None:
+      return None
+
+    self.pulled[i] = True
+    pos = self.kernel.write(m, self.state, i)
+    return self.results[i] if pos is None else pos
+
+
+class MoverBatch(object):
+  """
+  Advances all movers of supported classes with one vectorized step per
+  class (see C{L{Kernel}}) run once per frame by C{L{step}}, before sprites
+  are updated. C{Mover.update} then only copies computed state back to the
+  mover and returns position to the owner.
+
+  Movers join C{current} batch on their first update and take part in the
+  next step. Until then, and for movers of classes without kernel, updates
+  are computed one by one. Movers whose owners stop asking for updates
+  (killed sprites, replaced movers) leave the batch at the next step.
+
+  The batch is optional, it requires NumPy (see C{L{available}}).
+
+  @type current: C{L{MoverBatch}} or None
+  @cvar current: Batch movers join, None if movers update themselves.
+
+  @type kernels: C{dict}
+  @cvar kernels: Maps mover class to its C{L{Kernel}}.
+
+  @type tables: C{dict}
+  @ivar tables: Maps mover class to state of its batched movers.
+  """
+
+  current = None
+  kernels = {}
+
+  def __init__(self):
+    self.tables = {}
+
+  @staticmethod
+  def available():
+    """
+    Tell whether NumPy, required by the batch, is installed.
+    """
+
+    return numpy is not None
+
+  @staticmethod
+  def register(cls, kernel):
+    """
+    Batch movers of class C{cls} (not its subclasses) with C{kernel}.
+    """
+
+    MoverBatch.kernels[cls] = kernel
+
+  def add(self, m):
+    """
+    Add mover C{m} to the batch if its class has a kernel.
+    """
+
+    cls = m.__class__
+    if cls not in MoverBatch.kernels:
+      return
+
+    if cls not in self.tables:
+      self.tables[cls] = _Table(self, MoverBatch.kernels[cls])
+    self.tables[cls].add(m)
+
+  def step(self):
+    """
+    Advance all batched movers by the current frame span.
+    """
+
+    dt = Clock().frame_span()
+    for table in self.tables.itervalues():
+      table.step(dt)
+
+  def size(self):
+    """
+    Return number of batched movers.
+    """
+
+    return sum(len(t.movers) for t in self.tables.itervalues())
@@ -4,9 +4,11 @@
 '''Dummy object intended to place on a level just to display something.
 '''
 
+import sys
 import pygame
 import random
 from spaceship import Destructible
+from registry import Registry
 from mover import RandomMover, ZigZagMover, CircularMover, LinearMover
 
 class Obstacle(Destructible):
@@ -15,8 +17,7 @@ class Obstacle(Destructible):
     
     size = self.gfx['obstacle']['w'], self.gfx['obstacle']['h']
     
-    self.image = pygame.Surface(size)
-    self._blit_state('obstacle', 'def')
+    self._show_state('obstacle', 'def')
 
     self._initialize_position(pos, ('left', 'top'), size)
 
@@ -29,3 +30,6 @@ class MovingObstacle(Obstacle):
     #self.mover = CircularMover([pos[0], pos[1]], 1, {})
     #self.mover = LinearMover([pos[0], pos[1]], 1, {})
     #self.mover = LinearMover([pos[0], pos[1]], 60, {})
+
+
+Registry.register_module(sys.modules[__name__], 'game', Destructible)
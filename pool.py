@@ -0,0 +1,121 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Recycling of short-lived game objects.
+'''
+
+import logging
+log = logging.getLogger('ObjectPool')
+
+
+class ObjectPool(object):
+  """
+  Per-class free lists of killed sprites (projectiles, explosions, beams).
+  Instead of building a new object from scratch, C{L{acquire}} takes
+  a killed instance of the requested class and re-initializes it with its
+  C{reset} method, which has to accept the same arguments as the class
+  constructor. Pooled classes put their instances back with C{L{release}}
+  when they are killed.
+
+  Maximal length of a free list is taken from class property C{pool_size}
+  (see C{L{DBManager}}) and defaults to C{default_size}. Size 0 disables
+  pooling of a class.
+
+  @type default_size: C{int}
+  @cvar default_size: Free list length used for classes which do not define
+    C{pool_size} property.
+
+  @type free: C{dict}
+  @cvar free: Maps class to list of its instances ready for reuse.
+
+  @type hits: C{dict}
+  @cvar hits: Maps class name to number of requests served from the pool.
+
+  @type misses: C{dict}
+  @cvar misses: Maps class name to number of requests which required
+    creation of a new instance.
+  """
+
+  default_size = 64
+
+  free = {}
+  hits = {}
+  misses = {}
+
+  _sizes = {}
+
+  @staticmethod
+  def acquire(cls, *args):
+    """
+    Return instance of C{cls} initialized with C{args}, reusing a killed
+    instance if there is one.
+    """
+
+    name = cls.__name__
+    free = ObjectPool.free.get(cls)
+    if free:
+      obj = free.pop()
+      obj._pooled = False
+      obj.reset(*args)
+      ObjectPool.hits[name] = ObjectPool.hits.get(name, 0) + 1
+      return obj
+
+    ObjectPool.misses[name] = ObjectPool.misses.get(name, 0) + 1
+    return cls(*args)
+
+  @staticmethod
+  def release(obj):
+    """
+    Put killed C{obj} into the free list of its class unless the list is
+    full. Releasing an object twice has no effect.
+    """
+
+    if obj._pooled:
+      return
+
+    cls = obj.__class__
+    if cls not in ObjectPool._sizes:
+      ObjectPool._sizes[cls] = obj.cfg.get('pool_size',
+                                           ObjectPool.default_size)
+
+    free = ObjectPool.free.setdefault(cls, [])
+    if len(free) < ObjectPool._sizes[cls]:
+      obj._pooled = True
+      free.append(obj)
+
+  @staticmethod
+  def clear():
+    """
+    Drop all pooled objects (hit and miss counters are kept).
+    """
+
+    ObjectPool.free = {}
+
+  @staticmethod
+  def reset_stats():
+    """
+    Zero hit and miss counters.
+    """
+
+    ObjectPool.hits = {}
+    ObjectPool.misses = {}
+
+  @staticmethod
+  def stats():
+    """
+    Return dictionary mapping class name to C{(hits, misses)} pair.
+    """
+
+    stats = {}
+    for name in set(ObjectPool.hits) | set(ObjectPool.misses):
+      stats[name] = ObjectPool.hits.get(name, 0), ObjectPool.misses.get(name, 0)
+    return stats
+
+  @staticmethod
+  def log_stats():
+    """
+    Write hit and miss counters to the log.
+    """
+
+    for name, (hits, misses) in sorted(ObjectPool.stats().items()):
+      log.info('%s: %d hits, %d misses' % (name, hits, misses))
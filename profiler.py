@@ -0,0 +1,127 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Timing of application startup phases.
+'''
+
+import time
+import json
+import contextlib
+
+import logging
+log = logging.getLogger('StartupProfiler')
+
+
+class StartupProfiler(object):
+  """
+  Collects wall-clock times of bootstrap phases (display initialization,
+  content import, menu construction, ...) and of work done on individual
+  files (XML parsing, image decoding and conversion). Every record belongs
+  to a category (e.g. C{'phase'}, C{'xml'}, C{'decode'}) and is named
+  after the phase or file it describes.
+
+  Records are kept only when the profiler is enabled, timing itself is
+  always done so that callers may use measured times on their own.
+
+  @type enabled: C{bool}
+  @cvar enabled: Tells whether records are collected.
+
+  @type records: C{list}
+  @cvar records: Collected records - dictionaries with keys C{'category'},
+    C{'name'} and C{'seconds'}.
+  """
+
+  enabled = False
+  records = []
+
+  @staticmethod
+  def record(category, name, seconds):
+    """
+    Add record of C{seconds} spent on C{name} from C{category}.
+    """
+
+    if StartupProfiler.enabled:
+      StartupProfiler.records.append({'category' : category,
+                                      'name' : name,
+                                      'seconds' : seconds})
+
+  @staticmethod
+  @contextlib.contextmanager
+  def measure(category, name):
+    """
+    Context manager timing the enclosed block. The yielded dictionary gets
+    its C{'seconds'} key set when the block is left.
+
+    Usage::
+      with StartupProfiler.measure('phase', 'db') as r:
+        ...
+      print r['seconds']
+    """
+
+    r = {'seconds' : 0.0}
+    t = time.time()
+    try:
+      yield r
+    finally:
+      r['seconds'] = time.time() - t
+      StartupProfiler.record(category, name, r['seconds'])
+
+  @staticmethod
+  def reset():
+    """
+    Forget all records.
+    """
+
+    StartupProfiler.records = []
+
+  @staticmethod
+  def totals():
+    """
+    Return dictionary mapping category to total time of its records.
+    """
+
+    totals = {}
+    for r in StartupProfiler.records:
+      totals[r['category']] = totals.get(r['category'], 0.0) + r['seconds']
+    return totals
+
+  @staticmethod
+  def report():
+    """
+    Return records formatted as a table sorted by time (longest first),
+    preceded by totals of every category.
+    """
+
+    lines = ['%10s  %-10s  %s' % ('time [ms]', 'category', 'name')]
+
+    totals = StartupProfiler.totals()
+    for category in sorted(totals, key = totals.get, reverse = True):
+      lines.append('%10.1f  %-10s  %s' % (totals[category] * 1000.0,
+                                          category, '(total)'))
+
+    lines.append('')
+    for r in sorted(StartupProfiler.records,
+                    key = lambda r: r['seconds'], reverse = True):
+      lines.append('%10.1f  %-10s  %s' % (r['seconds'] * 1000.0,
+                                          r['category'], r['name']))
+
+    return '\n'.join(lines)
+
+  @staticmethod
+  def dump(path):
+    """
+    Write records and category totals to C{path} as JSON.
+    """
+
+    data = {'time' : time.time(),
+            'totals' : StartupProfiler.totals(),
+            'records' : StartupProfiler.records}
+
+    try:
+      f = open(path, 'w')
+      try:
+        json.dump(data, f, indent = 2, sort_keys = True)
+      finally:
+        f.close()
+    except IOError, e:
+      log.error('could not write startup profile %s: %s' % (path, e))
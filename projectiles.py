@@ -0,0 +1,194 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Vectorized movement of projectiles.
+'''
+
+import math
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from clock import Clock
+
+import logging
+log = logging.getLogger('ProjectileStore')
+
+
+class ProjectileStore(object):
+  """
+  Keeps state of projectiles flying in straight lines in NumPy arrays
+  (structure of arrays) and advances all of them with a few array operations
+  per frame instead of per-object C{update} calls. Position, direction,
+  speed, timers and animation frame of projectile in slot M{i} are kept at
+  index M{i} of the arrays; slots of killed projectiles are filled with the
+  last one, so the first C{size} slots are always in use.
+
+  Projectiles remain sprites - they are drawn and collide as before, their
+  rects are set from the arrays once per frame by C{L{update}}. Projectiles
+  attach themselves to C{current} store (see C{Projectile._attach}) if their
+  class does not customize movement or animation.
+
+  The store is optional, it requires NumPy (see C{L{available}}).
+
+  @type current: C{L{ProjectileStore}} or None
+  @cvar current: Store projectiles are attached to, None if projectiles
+    update themselves.
+
+  @type size: C{int}
+  @ivar size: Number of stored projectiles.
+
+  @type sprites: C{list}
+  @ivar sprites: Stored projectiles by slot.
+  """
+
+  current = None
+
+  _fields = (('x', 'f8'), ('y', 'f8'), ('sin', 'f8'), ('cos', 'f8'),
+             ('speed', 'f8'), ('w', 'i4'), ('h', 'i4'), ('time', 'i8'),
+             ('offscreen_time', 'i8'), ('lifetime', 'f8'), ('period', 'i8'),
+             ('frame_length', 'i8'), ('frame_count', 'i8'), ('frame', 'i8'))
+
+  def __init__(self, capacity = 256):
+    self.size = 0
+    self.sprites = []
+    self.screen_size = 0, 0
+
+    self.capacity = capacity
+    for name, dtype in ProjectileStore._fields:
+      setattr(self, name, numpy.zeros(capacity, dtype))
+
+  @staticmethod
+  def available():
+    """
+    Tell whether NumPy, required by the store, is installed.
+    """
+
+    return numpy is not None
+
+  def _grow(self):
+    """
+    Double capacity of the arrays.
+    """
+
+    self.capacity *= 2
+    for name, dtype in ProjectileStore._fields:
+      a = numpy.zeros(self.capacity, dtype)
+      a[:self.size] = getattr(self, name)[:self.size]
+      setattr(self, name, a)
+
+  def add(self, p):
+    """
+    Take over movement, offscreen culling and animation of projectile C{p}
+    moved by C{LinearMover}.
+    """
+
+    if self.size == self.capacity:
+      self._grow()
+
+    i = self.size
+    m = p.mover
+    self.x[i], self.y[i] = m.pos
+    self.sin[i], self.cos[i] = math.sin(m.dir), math.cos(m.dir)
+    self.speed[i] = m.speed
+    self.w[i], self.h[i] = p.rect.size
+    self.time[i] = p.time
+    self.offscreen_time[i] = p.offscreen_time
+    self.lifetime[i] = numpy.inf if p.offscreen_lifetime is None \
+                       else p.offscreen_lifetime
+    self.period[i] = p.period
+    self.frame_length[i] = p.frame_length
+    self.frame_count[i] = p.frame_count
+    self.frame[i] = -1
+
+    self.screen_size = p.screen_size
+    self.sprites.append(p)
+    self.size += 1
+
+    p._store, p._slot = self, i
+
+  def remove(self, p):
+    """
+    Give control back to projectile C{p}. Its mover, timers and position
+    are updated with the stored state.
+    """
+
+    i = p._slot
+    p.mover.pos = [float(self.x[i]), float(self.y[i])]
+    p.time = int(self.time[i])
+    p.offscreen_time = int(self.offscreen_time[i])
+    p._store = p._slot = None
+
+    last = self.size - 1
+    if i != last:
+      for name, dtype in ProjectileStore._fields:
+        a = getattr(self, name)
+        a[i] = a[last]
+      moved = self.sprites[last]
+      self.sprites[i] = moved
+      moved._slot = i
+
+    self.sprites.pop()
+    self.size = last
+
+  def update(self):
+    """
+    Move all stored projectiles, update their rects, kill those which spent
+    too much time off the screen and switch animation frames.
+    """
+
+    n = self.size
+    if n == 0:
+      return
+
+    dt = Clock().frame_span()
+    x, y = self.x[:n], self.y[:n]
+    w, h = self.w[:n], self.h[:n]
+
+    delta = dt * self.speed[:n] / 1000.
+    x += delta * self.sin[:n]
+    y += delta * self.cos[:n]
+
+    # round half away from zero, as round() does
+    cx = numpy.sign(x) * numpy.floor(numpy.abs(x) + 0.5)
+    cy = numpy.sign(y) * numpy.floor(numpy.abs(y) + 0.5)
+    left = cx.astype('i8') - w // 2
+    top = cy.astype('i8') - h // 2
+
+    sw, sh = self.screen_size
+    offscreen = (top + h < 0) | (top > sh) | (left < 0) | (left + w > sw)
+    offscreen_time = self.offscreen_time[:n]
+    offscreen_time[:] = numpy.where(offscreen, offscreen_time + dt, 0)
+    dead = offscreen_time > self.lifetime[:n]
+
+    time = self.time[:n]
+    period = self.period[:n]
+    frame_length = self.frame_length[:n]
+    frame_count = self.frame_count[:n]
+    animated = (period > 0) & (frame_count > 1) & (frame_length > 0)
+    frame = numpy.where(animated,
+                        (time % numpy.maximum(period, 1)) //
+                        numpy.maximum(frame_length, 1), -1)
+    switch = animated & (frame < frame_count) & (frame != self.frame[:n]) \
+             & ~dead
+    self.frame[:n] = numpy.where(switch, frame, self.frame[:n])
+    time += dt
+
+    sprites = self.sprites
+    pos = zip(cx.tolist(), cy.tolist())
+    for i, (l, t) in enumerate(zip(left.tolist(), top.tolist())):
+      p = sprites[i]
+      p.prev_pos = p.rect.topleft
+      p.rect.topleft = l, t
+      p.pos = pos[i]
+      p.center = p.rect.center
+
+    for i in numpy.flatnonzero(switch).tolist():
+      p = sprites[i]
+      p._show_state(p.base_res_name, 'frame%d' % self.frame[i])
+
+    # killing fills slots with the last projectiles, so go backwards
+    for i in numpy.flatnonzero(dead)[::-1].tolist():
+      sprites[i].kill()
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Resolution of class names used in game content.
+'''
+
+import inspect
+
+
+class Registry(object):
+  """
+  Game classes registered under the names used by the database (C{db/})
+  and stage files (C{stages/}). Classes are grouped by kind: C{'game'}
+  (ships, weapons, projectiles, explosions, bonuses and everything else
+  described in the database) and C{'mover'}.
+
+  Modules defining game classes register them when they are imported (see
+  C{L{register_module}}).
+
+  @type content: C{dict}
+  @cvar content: Maps kind to dictionary of classes by name.
+
+  @type list_props: C{tuple}
+  @cvar list_props: Names of database properties holding lists of class
+    names. Besides these, every property whose name ends with C{_cls_name}
+    holds a single class name.
+  """
+
+  content = {}
+
+  list_props = ('weapons_cls_names', 'shield_chain')
+
+  @staticmethod
+  def register(cls, kind = 'game', name = None):
+    """
+    Register C{cls} as C{name} (defaults to class name).
+    """
+
+    Registry.content.setdefault(kind, {})[name or cls.__name__] = cls
+
+  @staticmethod
+  def register_module(module, kind = 'game', base = None):
+    """
+    Register all classes defined in C{module}. If C{base} is given only
+    its subclasses (excluding C{base} itself) are registered.
+    """
+
+    for name, cls in vars(module).items():
+      if not inspect.isclass(cls) or cls.__module__ != module.__name__:
+        continue
+      if base is not None and (cls is base or not issubclass(cls, base)):
+        continue
+      Registry.register(cls, kind, name)
+
+  @staticmethod
+  def get(name, kind = 'game'):
+    """
+    Return class registered as C{name} or raise C{ValueError}.
+    """
+
+    try:
+      return Registry.content[kind][name]
+    except KeyError:
+      raise ValueError("Unknown %s class '%s'" % (kind, name))
+
+  @staticmethod
+  def has(name, kind = 'game'):
+    """
+    Tell whether a class is registered as C{name}.
+    """
+
+    return name in Registry.content.get(kind, {})
+
+  @staticmethod
+  def names(kind = 'game', base = None):
+    """
+    Return sorted names of registered classes of C{kind}, optionally only
+    of subclasses of C{base}.
+    """
+
+    classes = Registry.content.get(kind, {})
+    return sorted(name for name, cls in classes.items()
+                  if base is None or issubclass(cls, base))
+
+  @staticmethod
+  def referenced_names(props):
+    """
+    Return list of class names referenced by database properties C{props}.
+    """
+
+    names = []
+    for prop, value in props.items():
+      if prop in Registry.list_props:
+        names.extend(value)
+      elif prop.endswith('_cls_name') and value:
+        names.append(value)
+    return names
+
+  @staticmethod
+  def validate_db(conf):
+    """
+    Check that every class name referenced by the database is registered.
+    Raise C{ValueError} listing all unknown names.
+
+    @type  conf: C{dict}
+    @param conf: Classes' configuration as returned by C{DBManager.get}.
+    """
+
+    errors = []
+    for class_name in sorted(conf):
+      for name in Registry.referenced_names(conf[class_name]['props']):
+        if not Registry.has(name):
+          errors.append("%s: unknown class '%s'" % (class_name, name))
+
+    if errors:
+      raise ValueError('Invalid class references in database:\n  ' +
+                       '\n  '.join(errors))
@@ -5,10 +5,13 @@ import os, sys, random
 import pygame
 #from profilehooks import profile
 
+from base import bind_all
 from dbmanager import DBManager
 from gfxmanager import GfxManager
 from stagemanager import StageManager
 from groupmanager import GroupManager
+from collision import CollisionPhase
+from spawner import Spawner
 from spaceship import BonusHolder
 from spaceship import PlayerShip, EnemyShip, EnemyInterceptor, EnemyMine, \
     MidgetBeamShip
@@ -16,6 +19,8 @@ from spaceship import EnergyProjectile
 from spaceship import RechargeBonus, SuperShieldBonus, ShieldUpgradeBonus
 from background import SpaceBackground, BackgroundImage
 from obstacle import Obstacle, MovingObstacle
+import spaceship
+import obstacle
 import mover
 from clock import Clock
 from hud import Hud
@@ -45,6 +50,7 @@ def run():
 
   dbman = DBManager()
   dbman.import_db('./db')
+  bind_all(dbman.get(), spaceship, obstacle)
 
   gfxman = GfxManager()
   gfxman.import_gfx(dbman.get(), './gfx')
@@ -65,6 +71,8 @@ def run():
   g_shields = groupmanager.add('shields')
   g_bonuses = groupmanager.add('bonuses')
 
+  collisions = CollisionPhase()
+
   hud = Hud(viewport_size)
 
   g_enemies.add(Obstacle((60, 30)))
@@ -82,64 +90,9 @@ def run():
 
   for stage_name in sorted(stages.keys()):
     stage_clock = 0
+    spawner = Spawner(stage_name, stages[stage_name])
     while True:
-      for spawn_time in stages[stage_name]['spawn']:
-        if spawn_time <= stage_clock:
-          while stages[stage_name]['spawn'][spawn_time]:
-            spawn = stages[stage_name]['spawn'][spawn_time].pop()
-            pos = spawn['x'], spawn['y']
-
-            object_cls = eval(spawn['object_cls_name'])
-            if spawn['object_base_cls_name']:
-              if spawn['object_base_cls_name'] == 'Projectile':
-                if not spawn.has_key('object_params'):
-                  raise ValueError, "Params for projectile '%s' in stage %s \
-                      not set" % (spawn['object_cls_name'], stage_name)
-
-                if not spawn['object_params'].has_key('dir'):
-                  raise ValueError, "Invalid 'dir' for projectile '%s' in \
-                      stage %s" % (spawn['object_cls_name'], stage_name)
-
-                if not spawn['object_params'].has_key('collision_group'):
-                  raise ValueError, "Invalid 'collision_group' for projectile \
-                      '%s' in stage %s" % (spawn['object_cls_name'], stage_name)
-
-                params = spawn['object_params']
-
-                dir = params['dir']
-                g_coll = groupmanager.get(params['collision_group'])
-                object = object_cls(pos, dir, g_coll)
-
-              elif spawn['object_base_cls_name'] == 'Bonus':
-                pass
-              else:
-                raise ValueError, "Invalid value '%s' for attrubite \
-                    'object_base_cls_name' in stage %s" % \
-                    (spawn['object_base_cls_name'], stage_name)
-            else:
-                object = object_cls(pos)
-
-            if spawn['bonus_cls_name']:
-              if isinstance(object, BonusHolder):
-                object.set_bonus(spawn['bonus_cls_name'], spawn['bonus_params'])
-              else:
-                raise ValueError, "Instances of %s can not hold bonuses." \
-                    % object.__class__.__name__
-
-            if spawn['mover_cls_name']:
-              mover_cls = eval("mover.%s" % spawn['mover_cls_name'])
-              m = mover_cls(pos, object.max_speed, spawn['mover_params'])
-              object.set_mover(m)
-
-            for g in spawn['groups']:
-              if g == 'enemies':
-                g_enemies.add(object)
-              elif g == 'explosions':
-                g_explosions.add(object)
-              elif g == 'enemy_projectiles':
-                g_enemy_projectiles.add(object)
-              elif g == 'player_projectiles':
-                g_player_projectiles.add(object)
+      spawner.spawn(stage_clock, groupmanager)
 
       # time management
       clock.tick(40)
@@ -187,6 +140,7 @@ def run():
       hud.clear(screen, clear_bg)
 
       g_draw.update()
+      collisions.run()
       hud.update()
 
       g_draw.draw(screen)
@@ -8,17 +8,20 @@ import pygame, math, random
 import sys
 
 import mover
+from animation import AnimationClip, ONCE
 from base import AGObject, AGRect, Overlay
 from dbmanager import DBManager
 from gfxmanager import GfxManager
 from groupmanager import GroupManager
 from signals import Signal
 from clock import Clock
+from pool import ObjectPool
+from projectiles import ProjectileStore
+from registry import Registry
 
 from functions import deg2rad, normalize_deg
 
 import application
-globals()['app'] = application.app
 
 import hud
 
@@ -34,6 +37,10 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
   @type gfx: dict
   @ivar gfx: The graphics resources provided by C{L{GfxManager}}.
 
+  @type variants: dict or None
+  @ivar variants: Composed images of the class provided by
+    C{L{GfxManager.get_variants}}, None if the class declares none.
+
   @type screen_size: sequence of two integers
   @ivar screen_size: Size of the screen in pixels.
 
@@ -63,17 +70,32 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
   @ivar align: Name or names of properties used to align object's C{rect}
     attribute.
 
-  @type _overlay: C{L{Overlay}}
-  @ivar _overlay: Object used to display auxiliary animations.
+  @type _overlay: C{L{Overlay}} or None
+  @ivar _overlay: Object used to display auxiliary animations. Created when
+    the first animation starts and drawn only while animations play.
 
   @type _animations: sequence
   @ivar _animations: Parameters of animations in progress.
+
+  @type _pooled: bool
+  @ivar _pooled: Tells whether the (killed) object waits in
+    C{L{ObjectPool}} for reuse.
+
+  @type _mask_state: tuple or None
+  @ivar _mask_state: Resource and state shown as C{image}, used to look up
+    collision mask (see C{L{get_mask}}). Resource is None if the object
+    shows a variant.
   '''
 
+  config_attrs = ('max_speed',)
+
   max_speed = 0
   offscreen_lifetime = 5000
   offscreen_time = 0
 
+  _pooled = False
+  _mask_state = None
+
   def __init__(self, pos, *groups):
     '''
     @type  pos: pair of integers
@@ -84,9 +106,9 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
     AGObject.__init__(self)
     pygame.sprite.Sprite.__init__(self, *groups)
 
-    self.cfg = DBManager().get(self.__class__.__name__)['props']
+    self._bind_config()
     self.gfx = GfxManager().get(self.__class__.__name__)
-    self._setattrs('max_speed', self.cfg)
+    self.variants = GfxManager().get_variants(self.__class__.__name__)
  
     screen = pygame.display.get_surface()
     self.screen_size = screen.get_size() if screen else (0, 0)
@@ -94,16 +116,39 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
     self._initialize_position(pos, 'center', (0, 0))
 
     self.mover = None
-    self._overlay = Overlay()
+    self._overlay = None
     self._animations = []
 
     g_draw = GroupManager().get('draw')
     g_draw.add(self)
-    g_draw.add(self._overlay)
 
     #signals
     self.killed = Signal()
-    
+
+  def reset(self, pos, *groups):
+    '''
+    Re-initialize killed object taken from C{L{ObjectPool}} so that it
+    behaves as if it was just created. Class configuration, graphics and
+    auxiliary objects (overlay, signals) are reused. Pooled subclasses
+    extend this method and accept the same arguments as their constructors.
+    '''
+
+    pygame.sprite.Sprite.add(self, *groups)
+
+    self._initialize_position(pos, 'center', self.rect.size)
+    self.offscreen_time = 0
+
+    self.mover = None
+    self._animations = []
+    if self._overlay is not None:
+      self._overlay.kill()
+      self._overlay.clear()
+
+    g_draw = GroupManager().get('draw')
+    g_draw.add(self)
+
+    if self.killed.slots:
+      self.killed.disconnectAll()
 
   def set_mover(self, mover):
     """
@@ -146,10 +191,21 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
       if not self.gfx[r]:
         raise Exception("Required gfx resource '%s' not defined" % g);
 
+  def _check_variants(self, required_variants):
+    """
+    Auxiliary function that may be used to check if object's C{variants}
+    attribute contains required composed images.
+    """
+
+    for v in required_variants:
+      if self.variants is None or v not in self.variants['frames']:
+        raise Exception("Required variant '%s' not defined" % v)
+
   def _state_area(self, image, state):
     """
-    Return C{AGRect} containing information on position and area
-    of graphic resource representing selected state.
+    Return C{pygame.Rect} containing information on position and area
+    of graphic resource representing selected state. The rect is shared
+    and must not be modified.
 
     @type  image: string
     @param image: Name of graphic resource.
@@ -158,29 +214,53 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
     @param state: Name of state.
     """
 
-    return AGRect(self.gfx[image]['states'][state]['x_off'], 
-                  self.gfx[image]['states'][state]['y_off'], 
-                  self.gfx[image]['w'],
-                  self.gfx[image]['h'])
+    return self.gfx[image]['areas'][state]
 
-  def _blit_state(self, image, state, pos = (0, 0)):
+  def _show_state(self, image, state):
     '''
-    Blit selected image state aquired from GfxManager on image
-    representing current instance
-    
+    Make selected image state the object's C{image}. The state's frame is
+    shared with other objects (see C{L{GfxManager}}), so it must not be
+    drawn on.
+
     @type  image: string
     @param image: Name of resource in object's C{gfx} dictionary.
 
     @type  state: string
     @param state: Name of resource's state.
+    '''
 
-    @type  pos: sequence
-    @param pos: Position of upper-left corner of the image to be blit in 
-    object's C{image} coordinate space.
+    self.image = self.gfx[image]['frames'][state]
+    self._mask_state = image, state
+
+  def _show_nothing(self, size):
+    '''
+    Make a shared transparent surface of C{size} the object's C{image}.
+    '''
+
+    self.image = GfxManager().blank(size)
+    self._mask_state = None
+
+  def _show_variant(self, name):
+    '''
+    Make selected composed variant (see C{variants}) the object's C{image}.
+    Like state frames, variants are shared and must not be drawn on.
     '''
 
-    area = self._state_area(image, state)
-    self.image.blit(self.gfx[image]['image'], pos, area)
+    self.image = self.variants['frames'][name]
+    self._mask_state = None, name
+
+  def get_mask(self):
+    '''
+    Return collision mask of the resource state or variant shown as
+    C{image} or None if the object shows neither.
+    '''
+
+    if self._mask_state is None:
+      return None
+
+    res, state = self._mask_state
+    res = self.variants if res is None else self.gfx[res]
+    return GfxManager().mask(res, state)
 
   def _init_animation(self, res, period, pos = (0, 0), align = 'center'):
     """
@@ -202,25 +282,44 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
     to C{pos} (as when aligning C{L{AGRect}}.
     """
 
-    if not self._overlay.has_image():
+    dest = AGRect((0, 0), self.gfx[res]['size'])
+    dest.align(pos, align)
+
+    if self._overlay is None:
+      self._overlay = Overlay()
       self._overlay.init_image(self.image)
+    self._overlay.reserve(dest)
+    if not self._overlay.alive():
+      self._show_overlay()
 
-    size = self.gfx[res]['w'], self.gfx[res]['h']
     anim = {
-        'period'    : period,
-        'time'      : 0,
+        'clip'      : AnimationClip(self.gfx[res]['states'].keys(),
+                                    period = period, mode = ONCE),
         'resource'  : res,
-        'states'    : self.gfx[res]['states'].keys(),
-        'previous_state' : None,
-        'size'      : size,
-        'pos'       : pos,
-        'align'     : align
+        'dest'      : dest
         }
 
     self._animations.append(anim)
 
+  def _show_overlay(self):
+    """
+    Add overlay to group 'draw' right after the object, so that it is drawn
+    over the object but not over objects added later.
+    """
+
+    g_draw = GroupManager().get('draw')
+    g_draw.add(self._overlay)
+
+    # OrderedUpdates draws sprites in order of its (private) list
+    order = getattr(g_draw, '_spritelist', None)
+    if order is not None and self in g_draw:
+      order.remove(self._overlay)
+      order.insert(order.index(self) + 1, self._overlay)
+
   def _update_animations(self):
     """
+    Advance animations on object's overlay. Remove the overlay from group
+    'draw' when all of them end.
     """
     
     if len(self._animations) == 0:
@@ -229,29 +328,27 @@ class AGSprite(AGObject, pygame.sprite.Sprite):
     self._overlay.align(self.center)
 
     frame_span = self.clock.frame_span() / 1000.
-    for anim in self._animations:
-      dest = AGRect((0, 0), anim['size'])
-      dest.align(anim['pos'], anim['align'])
+    for anim in self._animations[:]:
+      dest = anim['dest']
 
-      if anim['time'] >= anim['period']:
+      state = anim['clip'].step(frame_span)
+      if anim['clip'].done:
         self._animations.remove(anim)
         self._overlay.clear(dest)
         continue
 
-      i = int(math.floor(anim['time'] * len(anim['states']) / anim['period']))
-      anim['time'] += frame_span
-
-      if anim['previous_state'] == i:
+      if state is None:
         continue
 
-      anim['previous_state'] = i
-
       res = anim['resource']
-      area = self._state_area(res, anim['states'][i])
+      area = self._state_area(res, state)
 
       self._overlay.clear(dest)
       self._overlay.blit(self.gfx[res]['image'], dest, area)
 
+    # idle overlay is not drawn
+    if len(self._animations) == 0:
+      self._overlay.kill()
 
   def _initialize_position(self, pos, align, size):
     """
@@ -364,6 +461,8 @@ class Destructible(AGSprite):
       one standard argument - position of the explosion.
   """
 
+  config_attrs = ('durability', 'explosion_cls_name')
+
   durability = 0
   explosion_cls_name = None
 
@@ -372,7 +471,6 @@ class Destructible(AGSprite):
     """
 
     AGSprite.__init__(self, pos, *groups)
-    self._setattrs('durability, explosion_cls_name', self.cfg)
 
   def damage(self, damage, speed = None):
     """
@@ -394,8 +492,8 @@ class Destructible(AGSprite):
     """Blow the object up and cease its existence."""
 
     if self.explosion_cls_name is not None:
-      explosion_cls = eval(self.explosion_cls_name)
-      explosion = explosion_cls(self.rect.center)
+      explosion_cls = Registry.get(self.explosion_cls_name)
+      explosion = ObjectPool.acquire(explosion_cls, self.rect.center)
 
       GroupManager().get('explosions').add( explosion )
 
@@ -436,7 +534,7 @@ class BonusHolder(Destructible):
     if self._bonus_cls_name is None:
       return None
 
-    bonus_cls = eval(self._bonus_cls_name)
+    bonus_cls = Registry.get(self._bonus_cls_name)
     bonus = bonus_cls(self.pos, self._bonus_params)
     GroupManager().get('bonuses').add(bonus)
 
@@ -584,6 +682,8 @@ class PlayerShip(Ship):
   be moved to not yet existant class Hull.
   """
 
+  config_attrs = ('shot_anim_period',)
+
   def __init__(self, pos, *groups):
     """
     @type  pos: sequence
@@ -595,20 +695,15 @@ class PlayerShip(Ship):
     """
 
     Ship.__init__(self, pos, *groups)
-    self._setattrs('shot_anim_period', self.cfg)
     self._check_gfx(['ship', 'exhaust', 'shot'])
+    self._check_variants(['exhaust_on', 'exhaust_off'])
 
-    size = self.gfx['ship']['w'], \
-           self.gfx['ship']['h'] + self.gfx['exhaust']['h']
-
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx['ship']['image'])
+    self.exhaust(False) 
 
+    size = self.image.get_size()
     self._initialize_position(pos, ('centerx', 'top'), size)
     self.center = self.pos[0], self.pos[1] + self.gfx['ship']['h'] / 2
 
-    self.exhaust(False) 
-
     self.weapons = [SeekerBlaster(self),
                     SeekerCannon(self),
                     MultiCannon(self),
@@ -648,14 +743,7 @@ class PlayerShip(Ship):
     exhaust at the bottom.
     """
     
-    state = 'on' if on else 'off'
-
-    self.image.fill((0, 0, 0, 0))
-    self._blit_state('ship', 'def')
-    self._blit_state('exhaust',
-                     state,
-                     (self.gfx['ship']['w']/2 - self.gfx['exhaust']['w']/2,
-                      self.gfx['ship']['h']))
+    self._show_variant('exhaust_on' if on else 'exhaust_off')
 
   # moving
   def fly_up(self, on):
@@ -683,7 +771,7 @@ class PlayerShip(Ship):
     """
 
     delta_y = round(self.clock.frame_span() * self.max_speed / 1000.)
-    if self.rect.bottom <= app.screen_height + delta_y:
+    if self.rect.bottom <= application.app.screen_height + delta_y:
       self.rect.move_ip(0, delta_y)
       self.pos = self.pos[0], self.pos[1] + delta_y
       self.center = self.pos[0], self.pos[1] + self.gfx['ship']['h'] / 2
@@ -705,7 +793,7 @@ class PlayerShip(Ship):
     """
 
     delta_x = round(self.clock.frame_span() * self.max_speed / 1000.)
-    if self.rect.right <= app.screen_width - delta_x:
+    if self.rect.right <= application.app.screen_width - delta_x:
       self.rect.move_ip(delta_x, 0)
       self.pos = self.pos[0] + delta_x, self.pos[1]
       self.center = self.pos[0], self.pos[1] + self.gfx['ship']['h'] / 2
@@ -786,12 +874,12 @@ class EnemyShip(Ship):
 
     Ship.__init__(self, pos, *groups)
  
-    size = self.gfx['ship']['w'], self.gfx['ship']['h']
-
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx['ship']['image'])
+    if self.variants is not None and 'def' in self.variants['frames']:
+      self._show_variant('def')
+    else:
+      self._show_state('ship', 'def')
 
-    self._blit_state('ship', 'def')
+    size = self.image.get_size()
     self._initialize_position(pos, ('centerx', 'bottom'), size)
 
     self._equip()
@@ -804,22 +892,22 @@ class EnemyShip(Ship):
 
     if self.cfg.has_key('weapons_cls_names'):
       for c in self.cfg['weapons_cls_names']:
-        weapon_cls = eval(c)
+        weapon_cls = Registry.get(c)
         self.weapons.append(weapon_cls(self))
 
     if len(self.weapons) > 0:
       self._current_weapon = 0
 
     if self.cfg.has_key('shield_cls_name'):
-      shield_cls = eval(self.cfg['shield_cls_name'])
+      shield_cls = Registry.get(self.cfg['shield_cls_name'])
       self.shield = shield_cls(self)
 
     if self.cfg.has_key('armour_cls_name'):
-      armour_cls = eval(self.cfg['armour_cls_name'])
+      armour_cls = Registry.get(self.cfg['armour_cls_name'])
       self.armour = armour_cls()
     
     if self.cfg.has_key('reactor_cls_name'):
-      reactor_cls = eval(self.cfg['reactor_cls_name'])
+      reactor_cls = Registry.get(self.cfg['reactor_cls_name'])
       self.reactor = reactor_cls()
 
   def shoot(self):
@@ -833,7 +921,7 @@ class EnemyShip(Ship):
 
   def update(self):
     Ship.update(self)
-    if self is None:
+    if not self.alive():
       return
 
     self.shoot()
@@ -869,81 +957,39 @@ class BeamShip(EnemyShip):
 class EnemyMine(Destructible):
   """
   """
-  
-  target = None
+
+  config_attrs = ('explosion_damage', 'explosion_range')
 
   def __init__(self, pos, *groups):
     Destructible.__init__(self, pos, *groups)
-    self._setattrs('explosion_damage, explosion_range', self.cfg)
 
     size = self.gfx['mine']['size']
 
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx['mine']['image'])
-
-    self._current_frame = 0
-    
-    self._blit_state('mine', 'frame' + str(self._current_frame))
+    self._show_state('mine', 'frame0')
     self._initialize_position(pos, 'center', size)
 
-    self.period = 1000.
-    self.frame_count = 10  # const
-    self.time = random.randint(0, self.period)
-    self.frame_length = self.period / self.frame_count
-
-    self.set_target(GroupManager().get('ship').sprites()[0])
-
-  def set_target(self, target):
-    """
-    Set target and connect to its killed-signal in order to allow
-    it to be garbage-collected.
-    """
-
-    if self.target is not None:
-      self.target.killed.disconnect(self.clear_target)
-
-    self.target = target
-    self.target.killed.connect(self.clear_target)
-
-  def clear_target(self, disconnect = False):
-    """
-    Unset target. Optionally disconnect from target's
-    signal (never disconnect when clear_target is called on signal).
-    """
-
-    if self.target is not None:
-      if disconnect:
-        self.target.killed.disconnect(self.clear_target)
-
-      self.target = None
+    self.clip = AnimationClip.from_resource(self.gfx['mine'], period = 1000.)
+    self.clip.time = random.randint(0, 1000)
 
-  def is_target_close(self):
+  def targets_in_range(self):
     """
-    Return C{True} if C{target} is within range. Otherwise return C{False}.
+    Return ships within C{explosion_range}.
     """
-  
-    if self.target is None:
-      return False
 
-    return self.target.distance(self) < self.explosion_range
+    return GroupManager().within(GroupManager().get('ship'), self.center,
+                                 self.explosion_range)
 
   def update(self):
-    if self.is_target_close():
-      self.target.damage(self.explosion_damage)
+    targets = self.targets_in_range()
+    if targets:
+      for t in targets:
+        t.damage(self.explosion_damage)
       self.explode()
       return
 
-    while self.time >= self.period:
-      self.time -= self.period
-
-    i = math.floor(self.time / self.period * (self.frame_count - 1))
-    if self._current_frame != i:
-      self._current_frame = int(i)
-
-      self.image.fill((0, 0, 0, 0))
-      self._blit_state('mine', 'frame' + str(self._current_frame))
-  
-    self.time += Clock().frame_span()
+    state = self.clip.step(Clock().frame_span())
+    if state is not None:
+      self._show_state('mine', state)
     
     Destructible.update(self)
 
@@ -959,9 +1005,10 @@ class AmmoConsumingItem(AGSprite):
   @ivar current: current number of ammo pieces in storage
   """
 
+  config_attrs = ('maximum',)
+
   def __init__(self):
     AGObject.__init__(self)
-    self._setattrs('maximum', self.cfg)
 
     self.current = self.maximum
 
@@ -996,6 +1043,8 @@ class EnergyConsumingItem(AGObject):
   @ivar cost: Amount of energy needed for one use.
   """
 
+  config_attrs = ('maximum', 'recharge_rate', 'cost')
+
   maximum = 0
   recharge_rate = 0
   cost = 0
@@ -1003,7 +1052,6 @@ class EnergyConsumingItem(AGObject):
   def __init__(self):
     AGObject.__init__(self)
 
-    self._setattrs('maximum, recharge_rate, cost', self.cfg)
     self.current = self.maximum
 
     # signals
@@ -1067,14 +1115,15 @@ class Weapon(AGObject):
   @ivar owner: Game object that owns the weapon.
   """
 
+  config_attrs = ('cooldown',)
+
   cooldown = 0
   remaining_cooldown = 0
 
   def __init__(self, owner):
     AGObject.__init__(self)
 
-    self.cfg = DBManager().get(self.__class__.__name__)['props']
-    self._setattrs('cooldown', self.cfg)
+    self._bind_config()
     self.owner = owner
 
     # signals
@@ -1190,13 +1239,14 @@ class TargetedProjectileWeapon(AGObject):
   @ivar targeting_angle: Half of the shooting arc in degrees.
   """
 
+  config_attrs = ('targeted', 'targeting_angle')
+
   targeted = False
   target = None
   targeting_angle = 60
 
   def __init__(self):
     AGObject.__init__(self)
-    self._setattrs('targeted, targeting_angle', self.cfg)
 
     self._find_target()
 
@@ -1231,15 +1281,12 @@ class TargetedProjectileWeapon(AGObject):
     """
 
     if isinstance(self.owner, EnemyShip):
-      targets = GroupManager().get('ship').sprites()
+      targets = GroupManager().get('ship')
     else:
-      targets = GroupManager().get('enemies').sprites()
-
-    for t in targets:
-      if self._target_dir(t) is None:
-        targets.remove(t)
+      targets = GroupManager().get('enemies')
 
-    target = self.owner.closest(targets)
+    target = GroupManager().nearest(targets, self.owner.center,
+        lambda t: self._target_dir(t) is not None)
     if target is not None:
       self.set_target(target)
 
@@ -1303,8 +1350,8 @@ class TargetedProjectileWeapon(AGObject):
       g_proj = GroupManager().get('player_projectiles')
       g_coll = GroupManager().get('enemies')
 
-    projectile_cls = eval(self.projectile_cls_name)
-    return projectile_cls(pos, dir, g_coll, g_proj)
+    projectile_cls = Registry.get(self.projectile_cls_name)
+    return ObjectPool.acquire(projectile_cls, pos, dir, g_coll, g_proj)
 
 
 class ProjectileAmmoWeapon(AmmoWeapon):
@@ -1313,9 +1360,10 @@ class ProjectileAmmoWeapon(AmmoWeapon):
   speed.
   """
 
+  config_attrs = ('projectile_cls_name',)
+
   def __init__(self, owner):
     AmmoWeapon.__init__(self, owner)
-    self._setattrs('projectile_cls_name', self.cfg)
 
   def _shoot(self, pos):
     """
@@ -1332,8 +1380,8 @@ class ProjectileAmmoWeapon(AmmoWeapon):
 
     dir = 0 if isinstance(self.owner, EnemyShip) else -180
 
-    projectile_cls = eval(self.projectile_cls_name)
-    return projectile_cls(pos, dir, g_coll, g_proj)
+    projectile_cls = Registry.get(self.projectile_cls_name)
+    return ObjectPool.acquire(projectile_cls, pos, dir, g_coll, g_proj)
 
   def shoot(self, pos):
     """
@@ -1378,15 +1426,15 @@ class SeekingProjectileWeapon:
 
     dir = 0 if isinstance(self.owner, EnemyShip) else -180
 
-    projectile_cls = eval(self.projectile_cls_name)
-    projectile = projectile_cls(pos, dir, g_coll, g_proj)
+    projectile_cls = Registry.get(self.projectile_cls_name)
+    projectile = ObjectPool.acquire(projectile_cls, pos, dir, g_coll, g_proj)
 
     if isinstance(self.owner, EnemyShip):
-      targets = GroupManager().get('ship').sprites()
+      targets = GroupManager().get('ship')
     else:
-      targets = GroupManager().get('enemies').sprites()
+      targets = GroupManager().get('enemies')
 
-    projectile.set_target(self.owner.closest(targets))
+    projectile.set_target(GroupManager().nearest(targets, self.owner.center))
 
     return projectile
 
@@ -1405,12 +1453,12 @@ class MultiShotProjectileWeapon:
   @ivar shoot_cnt: Number of projectiles. Must be greater than one.
   """
 
+  config_attrs = ('shooting_angle', 'shoot_cnt')
+
   shooting_angle = 15
   shoot_cnt = 3
 
   def __init__(self):
-    self._setattrs('shooting_angle, shoot_cnt', self.cfg)
-
     if self.shoot_cnt < 2:
       raise ValueError, "MultiShotProjectileWeapon should shoot at least 2 \
           projectiles at once"
@@ -1427,7 +1475,7 @@ class MultiShotProjectileWeapon:
       g_proj = GroupManager().get('player_projectiles')
       g_coll = GroupManager().get('enemies')
 
-    projectile_cls = eval(self.projectile_cls_name)
+    projectile_cls = Registry.get(self.projectile_cls_name)
 
     dir = 0 if isinstance(self.owner, EnemyShip) else -180
 
@@ -1436,7 +1484,8 @@ class MultiShotProjectileWeapon:
       shoot_dir = dir + (2 * i / (self.shoot_cnt - 1.) - 1) * \
           self.shooting_angle
 
-      p.append(projectile_cls(pos, shoot_dir, g_coll, g_proj))
+      p.append(ObjectPool.acquire(projectile_cls, pos, shoot_dir, g_coll,
+                                  g_proj))
 
     return p
 
@@ -1505,63 +1554,29 @@ class InstantEnergyWeapon(EnergyWeapon):
   @ivar damage: Damage caused by single hit.
   """
 
+  config_attrs = ('damage', 'explosion_cls_name', 'beam_cls_name')
+
   damage = 1
 
   def __init__(self, owner):
     EnergyWeapon.__init__(self, owner)
-    self._setattrs('damage, explosion_cls_name, beam_cls_name', self.cfg)
-
-  @staticmethod
-  def _compare_player_target_pos(a, b):
-    if a.rect.bottom > b.rect.bottom:
-      return -1
-    elif a.rect.bottom == b.rect.bottom:
-      return 0
-    else:
-      return 1
-
-  @staticmethod
-  def _compare_enemy_target_pos(a, b):
-    if a.rect.top < b.rect.top:
-      return -1
-    elif a.rect.top == b.rect.top:
-      return 0
-    else:
-      return 1
 
   def _find_target(self, pos):
     """
     Return target that will be hit by the beam or None.
     """
 
-    targets = []
     if isinstance(self.owner, EnemyShip):
-      all_targets = GroupManager().get('ship').sprites()
-
-      for t in all_targets:
-        if pos[0] < t.rect.right and pos[0] > t.rect.left \
-          and pos[1] < t.rect.top:
-            targets.append(t)
-
-      targets.sort(cmp = self._compare_enemy_target_pos)
+      return GroupManager().raycast(GroupManager().get('ship'), pos, True)
     else:
-      all_targets = GroupManager().get('enemies').sprites()
-
-      for t in all_targets:
-        if pos[0] < t.rect.right and pos[0] > t.rect.left \
-          and pos[1] > t.rect.bottom:
-            targets.append(t)
-
-      targets.sort(cmp = self._compare_player_target_pos)
-
-    return targets[0] if len(targets) > 0 else None
+      return GroupManager().raycast(GroupManager().get('enemies'), pos, False)
 
   def _shoot(self, pos):
     """
     """
 
-    beam_cls = eval(self.beam_cls_name)
-    beam = beam_cls()
+    beam_cls = Registry.get(self.beam_cls_name)
+    beam = ObjectPool.acquire(beam_cls)
 
     GroupManager().get('beams').add(beam)
 
@@ -1586,8 +1601,8 @@ class InstantEnergyWeapon(EnergyWeapon):
       t_pos = pos[0], target.rect.bottom
       beam.set_position(pos, t_pos)
 
-    expl_cls = eval(self.explosion_cls_name)
-    expl = expl_cls(t_pos)
+    expl_cls = Registry.get(self.explosion_cls_name)
+    expl = ObjectPool.acquire(expl_cls, t_pos)
 
     GroupManager().get('explosions').add(expl)
 
@@ -1639,6 +1654,8 @@ class InstantEnergyBeam(AGSprite):
   @cvar def_image: image representing initial state of the beam, its width is equal to screen's width
   """
 
+  config_attrs = ('vanish_speed',)
+
   def_image = None
 
   def __init__(self):
@@ -1646,11 +1663,23 @@ class InstantEnergyBeam(AGSprite):
     """
 
     AGSprite.__init__(self, (0,0))
-    self.vanish_speed = self.cfg['vanish_speed']
     self.init = True
+    self.image = None
 
     self._init_def_image()
 
+  def reset(self):
+    """
+    Re-initialize pooled beam (see C{L{AGSprite.reset}}).
+    """
+
+    AGSprite.reset(self, (0, 0))
+    self.init = True
+
+  def kill(self):
+    AGSprite.kill(self)
+    ObjectPool.release(self)
+
   def _init_def_image(self):
     """
     Initialize single instance of image shared between all instances of this class
@@ -1666,7 +1695,8 @@ class InstantEnergyBeam(AGSprite):
 
     area = self._state_area('beam_slice', 'def')
     for i in xrange(0, self.screen_size[1] - 1):
-      self.__class__.def_image.blit(self.gfx['beam_slice']['image'], (0, i))
+      self.__class__.def_image.blit(self.gfx['beam_slice']['image'], (0, i),
+                                    area)
 
   def get_width(self):
     """Return width of the beam graphics in pixels."""
@@ -1679,7 +1709,8 @@ class InstantEnergyBeam(AGSprite):
     size = self.get_width(), int(math.fabs(begin[1] - end[1]))
 
     self._initialize_position(end, ('centerx', 'top'), size)
-    self.image = pygame.Surface(size)
+    if self.image is None or self.image.get_size() != size:
+      self.image = pygame.Surface(size)
     self.image.set_alpha(255)
     self.image.blit(self.__class__.def_image, (0, 0), (0, 0, size[0], size[1]))
 
@@ -1718,9 +1749,10 @@ class ProjectileEnergyWeapon(EnergyWeapon):
   projectiles moving with finite speed. 
   """
 
+  config_attrs = ('projectile_cls_name',)
+
   def __init__(self, owner):
     EnergyWeapon.__init__(self, owner)
-    self._setattrs('projectile_cls_name', self.cfg)
 
   def _shoot(self, pos):
     """
@@ -1737,8 +1769,8 @@ class ProjectileEnergyWeapon(EnergyWeapon):
 
     dir = 0 if isinstance(self.owner, EnemyShip) else -180
 
-    projectile_cls = eval(self.projectile_cls_name)
-    return projectile_cls(pos, dir, g_coll, g_proj)
+    projectile_cls = Registry.get(self.projectile_cls_name)
+    return ObjectPool.acquire(projectile_cls, pos, dir, g_coll, g_proj)
 
   def shoot(self, pos):
     """
@@ -1876,6 +1908,8 @@ class Shield(AGSprite):
   @ivar active: Tells whether shield is working or not.
   """
 
+  config_attrs = ('maximum', 'recharge_rate', 'cost')
+
   maximum = 0
   current = 0
   recharge_rate = 0
@@ -1889,14 +1923,10 @@ class Shield(AGSprite):
     self._check_gfx(['shield'])
     self._check_cfg(['maximum', 'recharge_rate', 'cost'])
 
-    self._setattrs('maximum, recharge_rate, cost', self.cfg)
-
     self.owner = owner
     self.current = self.maximum
 
-    size = self.gfx['shield']['w'], self.gfx['shield']['h']
-    self.image = pygame.Surface(size, pygame.SRCALPHA, 
-        self.gfx['shield']['image'])
+    self._show_nothing(self.gfx['shield']['size'])
 
     GroupManager().get('shields').add(self)
 
@@ -1911,7 +1941,13 @@ class Shield(AGSprite):
         self.activate(False)
 
       pos = self.owner.center
-      self._initialize_position(pos, 'center', self.gfx['shield']['size'])
+      if self.rect.size != self.gfx['shield']['size']:
+        self._initialize_position(pos, 'center', self.gfx['shield']['size'])
+      else:
+        # keep the rect, so that the shield is interpolated with its owner
+        self.pos = pos
+        self.rect.align(pos, 'center')
+        self.center = self.rect.center
 
     self.shield_state_updated(self)
 
@@ -1924,9 +1960,9 @@ class Shield(AGSprite):
 
     self.active = on
     if on and self.current > 0:
-      self._blit_state('shield', 'def')
+      self._show_state('shield', 'def')
     else:
-      self.image.fill((0, 0, 0, 0))
+      self._show_nothing(self.gfx['shield']['size'])
 
 
   def absorb(self, damage, efficiency = 1.0, speed = None):
@@ -1994,6 +2030,8 @@ class AutoShield(Shield):
   @ivar auto: Tells whether shield was activated automatically or not.
   """
 
+  config_attrs = ('critical_speed', 'vanish_speed')
+
   critical_speed = 0
   vanish_speed = 1
   auto = True
@@ -2002,7 +2040,6 @@ class AutoShield(Shield):
   
   def __init__(self, owner):
     Shield.__init__(self, owner)
-    self._setattrs('critical_speed, vanish_speed', self.cfg)
 
   def activate(self, on, auto = False):
     """
@@ -2082,6 +2119,8 @@ class SuperShield(AutoShield):
   @ivar time: Current lifetime in miliseconds.
   """
 
+  config_attrs = ('lifetime',)
+
   def __init__(self, owner):
     """
     Init as normal C{AutoShield} and take over C{owner} grabbing reference
@@ -2090,7 +2129,6 @@ class SuperShield(AutoShield):
     """
 
     AutoShield.__init__(self, owner)
-    self._setattrs('lifetime', self.cfg)
 
     self.time = 0
     
@@ -2156,6 +2194,8 @@ class Armour(AGObject):
   @ivar current: amount of damage the armour can absorb at this moment (current durability)
   """
 
+  config_attrs = ('maximum',)
+
   maximum = 0
   current = 0
 
@@ -2165,8 +2205,7 @@ class Armour(AGObject):
 
     AGObject.__init__(self)
 
-    self.cfg = DBManager().get(self.__class__.__name__)['props']
-    self._setattrs('maximum', self.cfg)
+    self._bind_config()
 
 
   def absorb(self, damage, efficiency):
@@ -2203,6 +2242,8 @@ class Reactor(AGObject):
   @ivar power: Amount of energy produced per second.
   """
 
+  config_attrs = ('power',)
+
   power = 0
 
   def __init__(self):
@@ -2211,8 +2252,7 @@ class Reactor(AGObject):
 
     AGObject.__init__(self)
 
-    self.cfg = DBManager().get(self.__class__.__name__)['props']
-    self._setattrs('power', self.cfg)
+    self._bind_config()
 
   def supply(self):
     """
@@ -2231,39 +2271,49 @@ class BasicReactor(Reactor):
 
 
 class Explosion(AGSprite):
+  """
+  Animation of C{frame_count} states of resource C{'expl'} played once.
+  The explosion disappears when it ends.
+
+  @type clip: C{L{AnimationClip}}
+  @ivar clip: Played animation.
+  """
+
+  config_attrs = ('frame_length', 'frame_count')
+
   def __init__(self, pos, *groups):
     AGSprite.__init__(self, pos, *groups)
 
-    self.time = 0
-    self.frame_length = self.cfg['frame_length']
-    self.frame_count = self.cfg['frame_count']
-
+    self.clip = AnimationClip.from_resource(self.gfx['expl'],
+        self.frame_count, frame_length = self.frame_length, mode = ONCE,
+        on_complete = self.kill)
 
     size = self.gfx['expl']['size']
 
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx['expl']['image'])
-    self._blit_state('expl', 'frame0')
+    self._show_state('expl', 'frame0')
 
     self._initialize_position(pos, 'center', size)
 
-  def update(self):
-  # improving this method to increase the animation look wouldn't hurt
-    if self.time >= self.frame_count * self.frame_length:
-      self.kill()
-      self = None
-    else:
-      try:
-        for frame in range(0, self.frame_count):
-          if self.time in range(frame * self.frame_length,
-                                (frame + 1) * self.frame_length):
-            self.image.fill((0, 0, 0, 0))
-            self._blit_state('expl', 'frame' + str(frame))
-            break
-      except ValueError, value:
-        print "Warning: unhandled ValueError: %s" % value
+  def reset(self, pos, *groups):
+    """
+    Re-initialize pooled explosion (see C{L{AGSprite.reset}}).
+    """
+
+    AGSprite.reset(self, pos, *groups)
 
-      self.time += self.clock.frame_span()
+    self.clip.rewind()
+    self._show_state('expl', 'frame0')
+
+    self._initialize_position(pos, 'center', self.gfx['expl']['size'])
+
+  def kill(self):
+    AGSprite.kill(self)
+    ObjectPool.release(self)
+
+  def update(self):
+    state = self.clip.step(self.clock.frame_span())
+    if state is not None:
+      self._show_state('expl', state)
 
 
 class ShellExplosion(Explosion):
@@ -2288,12 +2338,15 @@ class EnergyProjectileExplosion(Explosion):
 
     size = self.gfx['expl']['w'], self.gfx['expl']['h']
 
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx['expl']['image'])
-    self._blit_state('expl', 'frame4')
+    self._show_state('expl', 'frame4')
 
     self._initialize_position(pos, ('centerx', 'centery'), size)
 
+  def reset(self, pos, *groups):
+    Explosion.reset(self, pos, *groups)
+
+    self._show_state('expl', 'frame4')
+
 
 class SmallExplosion(Explosion):
   pass
@@ -2327,15 +2380,34 @@ class Projectile(AGSprite):
   @type frame_count: int
   @type frame_count: Number of frames.
 
+  @type clip: C{L{AnimationClip}}
+  @ivar clip: Animation of the projectile (if it uses default animation
+  mechanics).
+
   @type time: int
   @ivar time: Time passed since projectile creation.
+
+  @type prev_pos: tuple
+  @ivar prev_pos: Top-left corner of C{rect} before the last move, used by
+  C{L{CollisionPhase}} to detect collisions along projectile's path.
+
+  @type storable: bool
+  @cvar storable: Tells whether instances moved by C{LinearMover} may be
+  updated by C{L{ProjectileStore}}. Subclasses which change movement or
+  extend C{update} must set it to False.
   """
   
+  config_attrs = ('damage', 'explosion_cls_name', 'base_res_name', 'period')
+
   damage = 0
   period = 0
   base_res_name = 'projectile'
   
   time = 0
+
+  storable = True
+  _store = None
+  _slot = None
   
   def __init__(self, pos, dir, g_coll, *groups):
     """
@@ -2348,35 +2420,102 @@ class Projectile(AGSprite):
     """
 
     AGSprite.__init__(self, pos, *groups)
- 
-    self._setattrs('damage, explosion_cls_name, base_res_name, period',
-        self.cfg)
 
     self._initialize_image()
     self._initialize_position(pos, 'center', 
         self.gfx[self.base_res_name]['size'])
+    self.prev_pos = self.rect.topleft
 
     self.g_coll = g_coll
     self.g_expl = GroupManager().get('explosions')
 
     self.mover = mover.LinearMover(pos, self.max_speed, {'dir' : dir})
+    self._attach()
+
+  def reset(self, pos, dir, g_coll, *groups):
+    """
+    Re-initialize pooled projectile (see C{L{AGSprite.reset}}). Accepts the
+    same arguments as the constructor.
+    """
+
+    m = self.mover
+    AGSprite.reset(self, pos, *groups)
+
+    self.time = 0
+    self._reset_image()
+    self._initialize_position(pos, 'center',
+        self.gfx[self.base_res_name]['size'])
+    self.prev_pos = self.rect.topleft
+
+    self.g_coll = g_coll
+    self.g_expl = GroupManager().get('explosions')
+
+    self.mover = m
+    self._reset_mover(pos, dir)
+    self._attach()
+
+  def _reset_mover(self, pos, dir):
+    """
+    Restart projectile's mover from C{pos} in direction C{dir}. The mover
+    is reused if it was not replaced by C{set_mover}.
+    """
+
+    if self.mover.__class__ is mover.LinearMover:
+      self.mover.reset(pos, {'dir' : dir})
+    else:
+      self.mover = mover.LinearMover(pos, self.max_speed, {'dir' : dir})
+
+  def _attach(self):
+    """
+    Hand the projectile over to current C{L{ProjectileStore}} if there is
+    one and the projectile flies in a straight line.
+    """
+
+    if ProjectileStore.current is not None and self.storable and \
+        self.mover.__class__ is mover.LinearMover:
+      ProjectileStore.current.add(self)
+
+  def _detach(self):
+    """
+    Take the projectile back from its C{L{ProjectileStore}}.
+    """
+
+    if self._store is not None:
+      self._store.remove(self)
+
+  def set_mover(self, mover):
+    self._detach()
+    AGSprite.set_mover(self, mover)
+    self._attach()
+
+  def kill(self):
+    self._detach()
+    AGSprite.kill(self)
+    ObjectPool.release(self)
 
   def _initialize_image(self):
     """
-    Initialize projectile's C{image} and blit first state. Initialize
+    Initialize projectile's C{image} with first state. Initialize
     C{frame_count} and C{frame_length}. This method may
     be overriden by subclasses. By default state C{'frame0'} of resource
-    C{'projectile'} is blit.    
+    C{'projectile'} is shown.
     """
 
     self.frame_count = len(self.gfx[self.base_res_name]['states'])
     self.frame_length = self.period / self.frame_count
+    self.clip = AnimationClip.from_resource(self.gfx[self.base_res_name],
+        frame_length = self.frame_length, period = self.period)
 
-    size = self.gfx[self.base_res_name]['size']
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx[self.base_res_name]['image'])
+    self._show_state(self.base_res_name, 'frame0')
 
-    self._blit_state(self.base_res_name, 'frame0')
+  def _reset_image(self):
+    """
+    Restore projectile's C{image} to the state set by
+    C{_initialize_image}.
+    """
+
+    self.clip.rewind()
+    self._show_state(self.base_res_name, 'frame0')
 
   def _update_image(self):
     """
@@ -2386,46 +2525,47 @@ class Projectile(AGSprite):
     cycled (N is equal to C{frame_count}.
     """
 
-    if self.period == 0 or self.frame_count == 1:
-      return
-
-    time = self.time % self.period
-    for frame in range(0, self.frame_count):
-      if time in range(frame * self.frame_length,
-                       (frame + 1) * self.frame_length):
-        self.image.fill((0, 0, 0, 0))
-        self._blit_state(self.base_res_name, 'frame' + str(frame))
-        break
+    state = self.clip.seek(self.time)
+    if state is not None:
+      self._show_state(self.base_res_name, state)
     
   def update(self):
     """
-    Update projectile's image, position, detect collisions and dispose of
-    the projectile if it leaves the screen.
+    Update projectile's image, position and dispose of the projectile if it
+    leaves the screen. Collisions are detected by C{L{CollisionPhase}}.
     
     This method may be overriden provided it does all mentioned above.
+    Projectiles attached to a C{L{ProjectileStore}} are updated by the
+    store.
     """
     
+    if self._store is not None:
+      return
+
+    self.prev_pos = self.rect.topleft
     AGSprite.update(self)
-    if self is None:
+    if not self.alive():
       return
 
     self._update_image()
-    self._detect_collisions()
 
     self.time += self.clock.frame_span()
 
   def explode(self):
-    explosion_cls = eval(self.explosion_cls_name)
+    explosion_cls = Registry.get(self.explosion_cls_name)
 
-    self.g_expl.add( explosion_cls(self.pos) )
+    self.g_expl.add( ObjectPool.acquire(explosion_cls, self.pos) )
     self.kill()
     del self
 
-  def _detect_collisions(self):
-    hit = pygame.sprite.spritecollide(self, self.g_coll, False)
-    if hit:  # hit is a list
-      hit[0].damage(self.damage, self.max_speed)
-      self.explode()
+  def collide(self, target):
+    """
+    Damage C{target} the projectile hit and explode. Called by
+    C{L{CollisionPhase}}.
+    """
+
+    target.damage(self.damage, self.max_speed)
+    self.explode()
 
 
 class ScatteringProjectile(Projectile):
@@ -2449,6 +2589,10 @@ class ScatteringProjectile(Projectile):
   'random', 'regular' - defaults to 'forward')
   """
 
+  config_attrs = ('lifetime', 'child_cnt', 'child_cls_name', 'scatter_type')
+
+  storable = False
+
   lifetime = 2000
   child_cnt = 2
   child_cls_name = None
@@ -2458,9 +2602,6 @@ class ScatteringProjectile(Projectile):
   def __init__(self, pos, dir, g_coll, *groups):
     Projectile.__init__(self, pos, dir, g_coll, *groups)
 
-    self._setattrs('lifetime, child_cnt, child_cls_name, scatter_type',
-        self.cfg)
-
     if self.child_cls_name is None:
       raise ValueError("Unknown child class name")
 
@@ -2469,7 +2610,7 @@ class ScatteringProjectile(Projectile):
     Spawn children and add them to proper groups.
     """
 
-    child_cls = eval(self.child_cls_name)
+    child_cls = Registry.get(self.child_cls_name)
     for i in xrange(self.child_cnt):
       if self.scatter_type == 'random':
         dir = 360 * random.random()
@@ -2478,10 +2619,13 @@ class ScatteringProjectile(Projectile):
       else:
         dir = self.mover.get_dir() + 90. * i / (self.child_cnt - 1) - 45
 
-      child = child_cls(self.pos, dir, self.g_coll, self.groups())
+      child = ObjectPool.acquire(child_cls, self.pos, dir, self.g_coll,
+                                 self.groups())
 
   def update(self):
     Projectile.update(self)
+    if not self.alive():
+      return
 
     if self.time >= self.lifetime:
       self.explode()
@@ -2503,14 +2647,23 @@ class SeekingProjectile(Projectile):
   not allowed for this class.
   """
 
+  config_attrs = ('ang_speed',)
+
+  storable = False
+
   def __init__(self, pos, dir, g_coll, *groups):
     Projectile.__init__(self, pos, dir, g_coll, *groups)
 
-    self._setattrs('ang_speed', self.cfg)
-
     mover_params = {'dir' : dir, 'ang_speed' : self.ang_speed}
     self.mover = mover.SeekingMover(pos, self.max_speed, mover_params)
 
+  def _reset_mover(self, pos, dir):
+    self.mover.reset(pos, {'dir' : dir, 'ang_speed' : self.ang_speed})
+
+  def kill(self):
+    self.clear_target(True)
+    Projectile.kill(self)
+
   def set_mover(self, mover):
     raise TypeError, "Cannot change SeekingProjectile mover"
   
@@ -2592,17 +2745,18 @@ class DirectedSeekingProjectile(SeekingProjectile):
     self.frame_count = None
     self.frame_length = None
 
-    size = self.gfx[self.base_res_name]['size']
-    self.image = pygame.Surface(size, pygame.SRCALPHA,
-        self.gfx[self.base_res_name]['image'])
+    self._show_nothing(self.gfx[self.base_res_name]['size'])
+
+  def _reset_image(self):
+    self._show_nothing(self.gfx[self.base_res_name]['size'])
+    self._previous_state = None
 
   def _update_image(self):
     """Update projectile looks based on current direction."""
 
     state = self._get_dir_state(self.mover.get_dir())
     if self._previous_state is None or self._previous_state != state:
-      self.image.fill((0, 0, 0, 0))
-      self._blit_state(self.base_res_name, state)
+      self._show_state(self.base_res_name, state)
       self._previous_state = state
 
 
@@ -2703,33 +2857,20 @@ class Bonus(AGSprite):
     AGSprite.__init__(self, pos, *groups)
 
     size = self.gfx['bonus']['size']
-    self.image = pygame.Surface(size, pygame.SRCALPHA, 
-        self.gfx['bonus']['image'])
 
-    self._blit_state('bonus', 'def')
+    self._show_state('bonus', 'def')
     self._initialize_position(pos, 'center', size)
 
     self.mover = mover.CircularMover(pos, self.max_speed)
 
-  def _detect_collisions(self):
+  def collide(self, ship):
     """
-    Detect collisions and return single colliding ship or None.
+    Use bonus on C{ship} it collided with and disappear if it was used.
+    Called by C{L{CollisionPhase}}.
     """
 
-    ships = GroupManager().get('ship').sprites()
-    i = self.rect.collidelist(ships)
-    return None if i == -1 else ships[i]
-
-  def update(self):
-    AGSprite.update(self)
-    if self is None:
-      return
-
-    ship = self._detect_collisions()
-    if ship is not None:
-      if self._use(ship):
-        self.kill()
-        self = None
+    if self._use(ship):
+      self.kill()
 
   def _use(self, ship):
     """
@@ -2746,11 +2887,12 @@ class RechargeBonus(Bonus):
   This bonus recharges player ship's shields and energy weapons.
   """
 
+  config_attrs = ('power',)
+
   power = 100
 
   def __init__(self, pos, params = {}, *groups):
     Bonus.__init__(self, pos, params, *groups)
-    self._setattrs('power', self.cfg)
     self._setattrs('power', params)
 
   def _use(self, ship):
@@ -2783,9 +2925,10 @@ class ShieldUpgradeBonus(Bonus):
   Shield chain must be defined in bonus's XML config.
   """
 
+  config_attrs = ('shield_chain',)
+
   def __init__(self, pos, params = {}, *groups):
     Bonus.__init__(self, pos, *groups)
-    self._setattrs('shield_chain', self.cfg)
 
     if not self.shield_chain:
       raise ValueError, "Shield chain is empty!"
@@ -2808,7 +2951,7 @@ class ShieldUpgradeBonus(Bonus):
         active = ship.shield.active
         auto = ship.shield.auto if hasattr(ship.shield, 'auto') else None
 
-        new_shield_cls = eval(self.shield_chain[index + 1])
+        new_shield_cls = Registry.get(self.shield_chain[index + 1])
         
         ship.shield.kill()
         ship.shield = new_shield_cls(ship)
@@ -2820,10 +2963,12 @@ class ShieldUpgradeBonus(Bonus):
           ship.shield.activate(active)
 
     else:
-      new_shield_cls = eval(self.shield_chain[0])
+      new_shield_cls = Registry.get(self.shield_chain[0])
       ship.shield = new_shield_cls(ship)
       ship.shield.shield_state_updated.connect(ship.shield_updated)
 
     ship.shield.shield_state_updated(ship.shield)
     return True
 
+
+Registry.register_module(sys.modules[__name__], 'game', AGObject)
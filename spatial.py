@@ -0,0 +1,352 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Spatial indexes of sprite groups used by collision and distance queries.
+'''
+
+import bisect
+
+class SpatialHash(object):
+  """
+  Uniform grid over the rects of sprites of a single group. Every sprite is
+  put into all cells its rect (inflated by C{margin}) overlaps, so a query
+  needs to look only at sprites sharing cells with the queried rect instead
+  of the whole group.
+
+  The grid is a snapshot - it is rebuilt once per frame (C{L{rebuild}}).
+  Queries test candidates against their current rects, so sprites which
+  moved less than C{margin} pixels since the rebuild are found exactly
+  as by C{pygame.sprite.spritecollide}. Killed sprites are skipped and
+  sprites added to the group since the rebuild trigger a rebuild.
+
+  @type group: C{pygame.sprite.AbstractGroup}
+  @ivar group: Indexed group.
+
+  @type cell_size: C{int}
+  @ivar cell_size: Width and height of a grid cell in pixels.
+
+  @type margin: C{int}
+  @ivar margin: Distance (in pixels) sprites may move between rebuilds
+    without being missed by queries.
+
+  @type cells: C{dict}
+  @ivar cells: Maps C{(column, row)} pair to list of sprites.
+
+  @type sprites: C{list}
+  @ivar sprites: Sprites of the group at the moment of the last rebuild.
+
+  @type points: C{dict}
+  @ivar points: Maps C{(column, row)} pair to list of sprites whose centers
+    (see C{L{center}}) lie in the cell. Used by distance queries.
+
+  @type columns: C{dict}
+  @ivar columns: Maps column to sprites overlapping it sorted by C{top} and
+    by C{bottom} (see C{L{raycast}}). Built on demand after every rebuild,
+    None until then.
+  """
+
+  def __init__(self, group, cell_size = 64, margin = 16):
+    self.group = group
+    self.cell_size = cell_size
+    self.margin = margin
+
+    self.cells = {}
+    self.points = {}
+    self.columns = None
+    self.sprites = []
+    self._order = {}
+    self._extent = None
+
+  def _cell_range(self, rect, margin = 0):
+    """
+    Return ranges of columns and rows of cells overlapped by C{rect}
+    inflated by C{margin} on every side.
+    """
+
+    cs = self.cell_size
+    left, top = rect.left - margin, rect.top - margin
+    right = max(rect.right + margin - 1, left)
+    bottom = max(rect.bottom + margin - 1, top)
+
+    return xrange(left // cs, right // cs + 1), \
+           xrange(top // cs, bottom // cs + 1)
+
+  def rebuild(self):
+    """
+    Rebuild the grid from current rects of sprites of the group.
+    """
+
+    cells = {}
+    points = {}
+    self.sprites = self.group.sprites()
+    self._order = {}
+
+    cs = self.cell_size
+    for i, sprite in enumerate(self.sprites):
+      self._order[sprite] = i
+
+      x, y = center(sprite)
+      key = int(x // cs), int(y // cs)
+      if key in points:
+        points[key].append(sprite)
+      else:
+        points[key] = [sprite]
+
+      columns, rows = self._cell_range(sprite.rect, self.margin)
+      for cx in columns:
+        for cy in rows:
+          key = cx, cy
+          if key in cells:
+            cells[key].append(sprite)
+          else:
+            cells[key] = [sprite]
+
+    self.cells = cells
+    self.points = points
+    self.columns = None
+
+    if points:
+      columns = [cx for cx, cy in points]
+      rows = [cy for cx, cy in points]
+      self._extent = min(columns), min(rows), max(columns), max(rows)
+    else:
+      self._extent = None
+
+  def _check(self):
+    """
+    Rebuild the grid if sprites were added to the group since the last
+    rebuild. Sprites are compared by identity, so a sprite added in place
+    of a killed one is noticed too.
+    """
+
+    if not self._order.viewkeys() >= self.group.spritedict.viewkeys():
+      self.rebuild()
+
+  def candidates(self, rect):
+    """
+    Return sprites which may collide with C{rect}, in the order of the
+    group's C{sprites} list. Rects are not tested.
+    """
+
+    self._check()
+
+    found = {}
+    columns, rows = self._cell_range(rect)
+    for cx in columns:
+      for cy in rows:
+        for sprite in self.cells.get((cx, cy), ()):
+          found[sprite] = True
+
+    group = self.group
+    return sorted((s for s in found if s in group), key = self._order.get)
+
+  def query(self, rect):
+    """
+    Return sprites of the group whose rects overlap C{rect}.
+    """
+
+    return [s for s in self.candidates(rect) if rect.colliderect(s.rect)]
+
+  def spritecollide(self, sprite, dokill = False, collided = None):
+    """
+    Equivalent of C{pygame.sprite.spritecollide(sprite, group, dokill,
+    collided)} for the indexed group. Custom C{collided} callbacks are
+    applied to candidates whose rects overlap the rect of C{sprite}, so
+    they must not report collisions of sprites with disjoint rects.
+    """
+
+    hit = self.query(sprite.rect)
+    if collided is not None:
+      hit = [s for s in hit if collided(sprite, s)]
+
+    if dokill:
+      for s in hit:
+        s.kill()
+
+    return hit
+
+  def collidelist(self, rect):
+    """
+    Equivalent of C{rect.collidelist(self.sprites)}: return index of the
+    first sprite (in C{sprites}) whose rect overlaps C{rect} or -1.
+    """
+
+    for s in self.candidates(rect):
+      if rect.colliderect(s.rect):
+        return self._order[s]
+    return -1
+
+  def nearest(self, pos, accept = None):
+    """
+    Return sprite of the group whose center is closest (in city metric, as
+    C{AGSprite.distance}) to C{pos} or None if there is no such sprite.
+    Cells are searched in rings of growing size around C{pos}, so only
+    sprites in the neighbourhood of the result are looked at.
+
+    @type  accept: callable
+    @param accept: Optional predicate. If given, only sprites for which it
+      returns true are considered (e.g. targets within shooting arc). It is
+      called only for sprites closer than the best one found so far.
+    """
+
+    self._check()
+    if self._extent is None:
+      return None
+
+    cs = self.cell_size
+    px, py = pos
+    pcx, pcy = int(px // cs), int(py // cs)
+    minx, miny, maxx, maxy = self._extent
+    rings = max(pcx - minx, maxx - pcx, pcy - miny, maxy - pcy, 0)
+
+    # sprites may have moved since the rebuild
+    slack = 2 * self.margin
+
+    group = self.group
+    order = self._order
+    best, best_d = None, None
+    for r in xrange(rings + 1):
+      # sprites in ring r are farther than (r - 1) * cs at the rebuild
+      if best is not None and best_d <= (r - 1) * cs - slack:
+        break
+
+      for key in _ring(pcx, pcy, r):
+        for sprite in self.points.get(key, ()):
+          if sprite not in group:
+            continue
+
+          x, y = center(sprite)
+          d = abs(px - x) + abs(py - y)
+          if best is not None and (d > best_d or
+              d == best_d and order[sprite] > order[best]):
+            continue
+          if accept is not None and not accept(sprite):
+            continue
+
+          best, best_d = sprite, d
+
+    return best
+
+  def within(self, pos, radius):
+    """
+    Return sprites of the group whose centers are closer (in city metric)
+    to C{pos} than C{radius}, in the order of C{sprites}.
+    """
+
+    self._check()
+
+    cs = self.cell_size
+    px, py = pos
+    reach = radius + 2 * self.margin
+
+    found = []
+    for cx in xrange(int((px - reach) // cs), int((px + reach) // cs) + 1):
+      for cy in xrange(int((py - reach) // cs), int((py + reach) // cs) + 1):
+        for sprite in self.points.get((cx, cy), ()):
+          x, y = center(sprite)
+          if abs(px - x) + abs(py - y) < radius and sprite in self.group:
+            found.append(sprite)
+
+    found.sort(key = self._order.get)
+    return found
+
+  def _build_columns(self):
+    """
+    Sort sprites of every column by C{top} (ascending) and C{bottom}
+    (descending, stored negated) of their rects.
+    """
+
+    cs = self.cell_size
+    m = self.margin
+
+    sprites = {}
+    for sprite in self.sprites:
+      r = sprite.rect
+      for col in xrange((r.left - m) // cs, (r.right + m - 1) // cs + 1):
+        if col in sprites:
+          sprites[col].append(sprite)
+        else:
+          sprites[col] = [sprite]
+
+    order = self._order
+    self.columns = {}
+    for col, col_sprites in sprites.iteritems():
+      down = sorted((s.rect.top, order[s], s) for s in col_sprites)
+      up = sorted((-s.rect.bottom, order[s], s) for s in col_sprites)
+      self.columns[col] = ([k for k, i, s in down], [s for k, i, s in down],
+                           [k for k, i, s in up], [s for k, i, s in up])
+
+  def raycast(self, pos, down = True):
+    """
+    Return the first sprite hit by a vertical ray cast from C{pos} - the one
+    with the smallest C{rect.top} greater than C{pos[1]} (C{down}) or with
+    the greatest C{rect.bottom} smaller than C{pos[1]} (not C{down}) among
+    sprites whose rects strictly straddle C{pos[0]}. Return None if the ray
+    hits nothing.
+
+    Sprites are looked up by bisection in the column containing the ray and
+    tested against their current rects.
+    """
+
+    self._check()
+    if self.columns is None:
+      self._build_columns()
+
+    x, y = pos
+    col = self.columns.get(int(x // self.cell_size))
+    if col is None:
+      return None
+
+    if down:
+      keys, sprites = col[0], col[1]
+      limit = y
+    else:
+      keys, sprites = col[2], col[3]
+      limit = -y
+
+    # keys are from the rebuild, current ones differ by at most margin
+    m = self.margin
+    group = self.group
+    best, best_key = None, None
+    for i in xrange(bisect.bisect_right(keys, limit - m), len(keys)):
+      if best is not None and keys[i] - m > best_key:
+        break
+
+      sprite = sprites[i]
+      r = sprite.rect
+      if not r.left < x < r.right or sprite not in group:
+        continue
+
+      key = r.top if down else -r.bottom
+      if key > limit and (best is None or key < best_key):
+        best, best_key = sprite, key
+
+    return best
+
+
+def center(sprite):
+  """
+  Return position of C{sprite} used by distance queries - its C{center}
+  attribute if it has one (see C{AGSprite}), center of its rect otherwise.
+  """
+
+  return getattr(sprite, 'center', None) or sprite.rect.center
+
+
+def _ring(cx, cy, r):
+  """
+  Return keys of cells at distance (in cells, maximum metric) C{r} from
+  cell C{(cx, cy)}.
+  """
+
+  if r == 0:
+    return [(cx, cy)]
+
+  keys = []
+  for x in xrange(cx - r, cx + r + 1):
+    keys.append((x, cy - r))
+    keys.append((x, cy + r))
+  for y in xrange(cy - r + 1, cy + r):
+    keys.append((cx - r, y))
+    keys.append((cx + r, y))
+  return keys
@@ -0,0 +1,222 @@
+#!/usr/bin/python
+#coding: utf-8
+
+'''Scheduling of objects spawned during a stage.
+
+Stage schedules imported by C{L{StageManager}} are compiled into immutable,
+time-sorted sequences of C{L{SpawnEvent}}s. Classes of spawned objects and
+their movers are resolved and spawn parameters are validated once, when the
+stage is compiled. C{L{Spawner}} walks a compiled stage with a cursor, so
+every frame it touches only events which are due, and can be rewound to
+replay the stage.
+'''
+
+import bisect
+from collections import namedtuple
+
+from registry import Registry
+
+# register spawnable classes
+import spaceship
+import mover
+
+
+SPAWN_GROUPS = ('enemies', 'explosions', 'enemy_projectiles',
+                'player_projectiles', 'bonuses')
+
+
+class SpawnEvent(namedtuple('SpawnEvent', 'time pos object_cls object_params '
+                            'collision_group mover_cls mover_params '
+                            'bonus_cls_name bonus_params groups')):
+  """
+  Single compiled spawn. C{object_cls} and C{mover_cls} are resolved
+  classes, C{collision_group} is the name of the group projectiles collide
+  with (C{None} for other objects), C{groups} is a tuple of names of groups
+  the object is added to.
+  """
+
+  __slots__ = ()
+
+
+def _resolve(cls_name, kind, stage_name):
+  '''Return registered class C{cls_name} or raise C{ValueError}.'''
+
+  try:
+    return Registry.get(cls_name, kind)
+  except ValueError, e:
+    raise ValueError('%s in stage %s' % (e, stage_name))
+
+
+def compile_stage(name, stage):
+  '''
+  Compile schedule of stage C{name} into a tuple of C{L{SpawnEvent}}s
+  sorted by spawn time. Spawns scheduled for the same time keep the order
+  in which they used to be spawned. Raise C{ValueError} if the schedule
+  refers to unknown classes or groups or misses required parameters.
+
+  @type  name: C{unicode}
+  @param name: Name of the stage (used in error messages).
+
+  @type  stage: C{dict}
+  @param stage: Stage contents as imported by C{L{StageManager}}.
+  '''
+
+  events = []
+  for spawn_time in sorted(stage['spawn']):
+    for spawn in reversed(stage['spawn'][spawn_time]):
+      object_cls = _resolve(spawn['object_cls_name'], 'game', name)
+      object_params = spawn.get('object_params') or {}
+      collision_group = None
+
+      if spawn['object_base_cls_name'] == 'Projectile':
+        if not spawn.has_key('object_params'):
+          raise ValueError, "Params for projectile '%s' in stage %s \
+              not set" % (spawn['object_cls_name'], name)
+
+        if not object_params.has_key('dir'):
+          raise ValueError, "Invalid 'dir' for projectile '%s' in \
+              stage %s" % (spawn['object_cls_name'], name)
+
+        if not object_params.has_key('collision_group'):
+          raise ValueError, "Invalid 'collision_group' for projectile \
+              '%s' in stage %s" % (spawn['object_cls_name'], name)
+
+        collision_group = object_params['collision_group']
+
+      elif spawn['object_base_cls_name'] and \
+          spawn['object_base_cls_name'] != 'Bonus':
+        raise ValueError, "Invalid value '%s' for attrubite \
+            'object_base_cls_name' in stage %s" % \
+            (spawn['object_base_cls_name'], name)
+
+      if spawn['bonus_cls_name']:
+        if not issubclass(object_cls, spaceship.BonusHolder):
+          raise ValueError, "Instances of %s can not hold bonuses." \
+              % object_cls.__name__
+        _resolve(spawn['bonus_cls_name'], 'game', name)
+
+      mover_cls = None
+      if spawn['mover_cls_name']:
+        mover_cls = _resolve(spawn['mover_cls_name'], 'mover', name)
+
+      for g in spawn['groups']:
+        if g not in SPAWN_GROUPS:
+          raise ValueError("Invalid group '%s' for '%s' in stage %s" %
+                           (g, spawn['object_cls_name'], name))
+
+      events.append(SpawnEvent(spawn['time'], (spawn['x'], spawn['y']),
+                               object_cls, object_params, collision_group,
+                               mover_cls, spawn['mover_params'],
+                               spawn['bonus_cls_name'], spawn['bonus_params'],
+                               tuple(sorted(spawn['groups']))))
+
+  return tuple(events)
+
+
+class Spawner(object):
+  """
+  Spawns objects of a compiled stage as the stage time passes.
+
+  @type compiled: C{dict}
+  @cvar compiled: Compiled stages by name, shared by all spawners.
+
+  @type name: C{unicode}
+  @ivar name: Name of the stage.
+
+  @type events: C{tuple}
+  @ivar events: Compiled spawn events sorted by time.
+
+  @type cursor: C{int}
+  @ivar cursor: Index of the first event not spawned yet.
+  """
+
+  compiled = {}
+
+  def __init__(self, name, stage):
+    """
+    @type  name: C{unicode}
+    @param name: Name of the stage.
+
+    @type  stage: C{dict}
+    @param stage: Stage contents as imported by C{L{StageManager}}. The
+    stage is compiled only once, later spawners reuse the compiled events.
+    """
+
+    self.name = name
+    self.events = Spawner.compile(name, stage)
+    self._times = [e.time for e in self.events]
+    self.cursor = 0
+
+  @staticmethod
+  def compile(name, stage):
+    """
+    Return compiled events of stage C{name}, compiling it if needed.
+    """
+
+    if name not in Spawner.compiled:
+      Spawner.compiled[name] = compile_stage(name, stage)
+    return Spawner.compiled[name]
+
+  @staticmethod
+  def compile_all(stages):
+    """
+    Compile all C{stages} (dictionary as returned by C{StageManager.get})
+    so that errors in any of them are reported at load time.
+    """
+
+    for name in stages:
+      Spawner.compile(name, stages[name])
+
+  def reset(self):
+    """
+    Rewind to the beginning of the stage.
+    """
+
+    self.cursor = 0
+
+  def done(self):
+    """
+    Tell whether all events of the stage were spawned.
+    """
+
+    return self.cursor >= len(self.events)
+
+  def due(self, stage_clock):
+    """
+    Return events due at C{stage_clock} which were not spawned yet and
+    advance the cursor past them.
+    """
+
+    end = bisect.bisect_right(self._times, stage_clock, self.cursor)
+    events = self.events[self.cursor:end]
+    self.cursor = end
+    return events
+
+  def spawn(self, stage_clock, grpm):
+    """
+    Create objects due at C{stage_clock} and add them to their groups.
+
+    @type  stage_clock: C{int}
+    @param stage_clock: Time elapsed since the stage start in miliseconds.
+
+    @type  grpm: C{L{GroupManager}}
+    @param grpm: Manager holding groups of the level.
+    """
+
+    for e in self.due(stage_clock):
+      if e.collision_group is not None:
+        object = e.object_cls(e.pos, e.object_params['dir'],
+                              grpm.get(e.collision_group))
+      elif issubclass(e.object_cls, spaceship.Bonus):
+        object = e.object_cls(e.pos, e.object_params)
+      else:
+        object = e.object_cls(e.pos)
+
+      if e.bonus_cls_name:
+        object.set_bonus(e.bonus_cls_name, e.bonus_params)
+
+      if e.mover_cls:
+        object.set_mover(e.mover_cls(e.pos, object.max_speed, e.mover_params))
+
+      for g in e.groups:
+        grpm.get(g).add(object)
@@ -5,10 +5,12 @@
 '''
 
 import os
+import time
 import pygame
 import xml.dom.minidom
 
-from xmlmanager import XMLManager
+from xmlmanager import XMLManager, ElementTree
+from profiler import StartupProfiler
 
 
 class StageManager(XMLManager):
@@ -18,32 +20,124 @@ class StageManager(XMLManager):
 
   content = {}
 
-  def import_stages(self, dir):
+  def import_stages(self, dir, cache = None, pool = None):
     """
     Import all files from specified directory and put contents in static
     variable C{StageManager.content}
+
+    @type  cache: C{L{ContentCache}} or C{None}
+    @param cache: If given, files which did not change since they were
+    cached are not parsed again; freshly parsed files are put in the cache.
+
+    @type  pool: C{multiprocessing.Pool} or C{None}
+    @param pool: If given, files are parsed by worker processes of the pool.
     """
 
     if not dir:
       raise Exception('StageManager error: no drectory specified')
     
+    paths = []
+    stages = {}
+    todo = []
     files = os.listdir(dir)
     for f in files:
       ff = os.path.join(dir, f)
       if os.path.isfile(ff):
-        try:
-          stage = self.import_file(ff)
-        except xml.parsers.expat.ExpatError:
-          print "Error parsing file %s" % ff
-          raise 
+        paths.append(ff)
+
+        stage = cache.lookup('stages', ff) if cache is not None else None
+        if stage is None:
+          todo.append(ff)
+        else:
+          stages[ff] = stage
+
+    if pool is not None and len(todo) > 1:
+      parsed = pool.map(_import_file, todo)
+    else:
+      parsed = map(_import_file, todo)
+
+    for ff, (stage, seconds) in zip(todo, parsed):
+      StartupProfiler.record('xml', ff, seconds)
+      if cache is not None:
+        cache.store('stages', ff, stage)
+      stages[ff] = stage
+
+    for ff in paths:
+      StageManager.content[os.path.basename(ff).rsplit('.', 1)[0]] = stages[ff]
 
-        StageManager.content[f.rsplit('.', 1)[0]] = stage
+    if cache is not None:
+      cache.prune('stages', paths)
 
   def import_file(self, filepath):
     """
     Import contents of a single file and returns them as a dictionary.
     """
 
+    if self._get_backend() == 'iterparse':
+      return self._import_file_iterparse(filepath)
+
+    return self._import_file_minidom(filepath)
+
+  def _import_file_iterparse(self, filepath):
+    """
+    Import contents of a single file in one streaming pass. Every spawn
+    element is discarded as soon as it is processed.
+    """
+
+    spawn = {}
+    events_seen = False
+    path = []
+
+    for event, elem in self.iterparse(filepath):
+      if event == 'start':
+        path.append(elem.tag)
+        continue
+
+      path.pop()
+
+      if elem.tag == 'events':
+        events_seen = True
+      elif elem.tag == 'spawn' and not events_seen and path and \
+          path[-1] == 'events':
+        time = int(self.get_attr(elem, 'time'))
+        s = {
+            'time' : time, 
+            'x' : int(self.get_attr(elem, 'x')), 
+            'y' : int(self.get_attr(elem, 'y')), 
+            'object_base_cls_name' : \
+                self.get_attr(elem, 'object_base_cls_name'),
+            'object_cls_name' : self.get_attr(elem, 'object_cls_name'),
+            'mover_cls_name' : self.get_attr(elem, 'mover_cls_name'),
+            'bonus_cls_name' : self.get_attr(elem, 'bonus_cls_name')
+            }
+
+        s['object_params'] = self.get_element_props(elem, 'object_param')
+        s['mover_params'] = self.get_element_props(elem, 'mover_param')
+        s['bonus_params'] = self.get_element_props(elem, 'bonus_param')
+
+        s['groups'] = {}
+        for g in elem.iter('group'):
+          s['groups'][self.get_attr(g, 'name')] = True
+
+        if not spawn.has_key(time):
+          spawn[time] = []
+
+        spawn[time].append(s)
+        elem.clear()
+
+      if len(path) == 1:
+        elem.clear()
+
+    if not events_seen:
+      raise ValueError("%s: missing 'events' element" % filepath)
+
+    return {'spawn' : spawn}
+
+  def _import_file_minidom(self, filepath):
+    """
+    Import contents of a single file using DOM.
+    """
+
     dom = xml.dom.minidom.parse(filepath)
     dom_events = dom.getElementsByTagName('events')[0].childNodes
 
@@ -90,3 +184,20 @@ class StageManager(XMLManager):
 
     return StageManager.content
     
+
+
+def _import_file(filepath):
+  """
+  Import contents of a single stage file. Module level entry point used
+  (also by worker processes) by C{StageManager.import_stages}. Return pair:
+  imported contents and time spent on parsing in seconds.
+  """
+
+  t = time.time()
+  try:
+    stage = StageManager().import_file(filepath)
+  except (xml.parsers.expat.ExpatError, ElementTree.ParseError):
+    print "Error parsing file %s" % filepath
+    raise
+
+  return stage, time.time() - t
@@ -9,6 +9,18 @@ from gfxmanager import GfxManager
 
 """This module supplies a number of widgets used to form the GUI."""
 
+LABEL_FONT = 'fonts/HookedUp.ttf', 20
+
+_fonts = {}
+
+def load_font(filename, size):
+  """Return font loaded from C{filename}. Every font is loaded only once."""
+
+  if (filename, size) not in _fonts:
+    _fonts[filename, size] = pygame.font.Font(filename, size)
+  return _fonts[filename, size]
+
+
 class Widget(pygame.sprite.Sprite):
   """A base widget object to be inherited from."""
 
@@ -8,13 +8,61 @@ import os
 import pygame
 import xml.dom.minidom
 
+try:
+  import xml.etree.cElementTree as ElementTree
+except ImportError:
+  import xml.etree.ElementTree as ElementTree
+
 
 class XMLManager:
   """
   This class is intended to be base class for other classes that do XML
   processing. This class provides some quite specialized DOM access methods.
+
+  Two parser backends are available. C{'iterparse'} reads every file in
+  a single streaming pass without keeping the document tree in memory,
+  C{'minidom'} builds full DOM tree first and then searches it. Both
+  backends produce identical results.
+
+  @type backend: C{str}
+  @cvar backend: Name of the parser backend used by managers: C{'iterparse'}
+    (default) or C{'minidom'}. May be set on C{XMLManager} or on a single
+    manager class.
   """
 
+  backend = 'iterparse'
+  backends = ('iterparse', 'minidom')
+
+  def _get_backend(self):
+    """
+    Return name of the selected backend or raise C{ValueError} if the
+    selected backend is unknown.
+    """
+
+    if self.backend not in XMLManager.backends:
+      raise ValueError("Unknown XML backend '%s'" % self.backend)
+
+    return self.backend
+
+  def convert_prop(self, value, type):
+    """
+    Return C{value} of a prop-node converted according to its C{type}
+    ('int', 'float', 'bool' or 'tuple'). If C{type} is empty C{value} is
+    returned unchanged.
+    """
+
+    if (type):
+      if type == 'int':
+        value = int(value)
+      elif type == 'float':
+        value = float(value)
+      elif type == 'bool':
+        value = bool(int(value))
+      elif type == 'tuple':
+        value = map(lambda x: x.strip(), value.split(','))
+
+    return value
+
   def get_props(self, node, prop_name):
     """
     Return dictionary containing values of C{prop_name} "prop-nodes" 
@@ -31,17 +79,42 @@ class XMLManager:
       name = p.getAttribute('name')
       type = p.getAttribute('type')
 
-      props[name] = p.getAttribute('value')
+      props[name] = self.convert_prop(p.getAttribute('value'), type)
+
+    return props
+
+  def get_attr(self, element, name):
+    """
+    Return value of attribute C{name} of C{ElementTree} C{element} the same
+    way minidom does: as unicode string, empty if attribute is not present.
+    """
 
-      if (type):
-        if type == 'int':
-          props[name] = int(props[name])
-        elif type == 'float':
-          props[name] = float(props[name])
-        elif type == 'bool':
-          props[name] = bool(int(props[name]))
-        elif type == 'tuple':
-          props[name] = map(lambda x: x.strip(), props[name].split(','))
+    return unicode(element.get(name, u''))
+
+  def get_element_props(self, element, prop_name):
+    """
+    C{ElementTree} counterpart of C{L{get_props}}. Return dictionary
+    containing values of C{prop_name} prop-nodes contained in C{element}.
+    """
+
+    props = {}
+    for p in element.iter(prop_name):
+      if p is element:
+        continue
+
+      name = self.get_attr(p, 'name')
+      type = self.get_attr(p, 'type')
+
+      props[name] = self.convert_prop(self.get_attr(p, 'value'), type)
 
     return props
+
+  def iterparse(self, filepath):
+    """
+    Return iterator over C{('start', element)} and C{('end', element)}
+    events of file C{filepath}. Attributes of an element are available
+    with its 'start' event, its children with its 'end' event.
+    """
+
+    return ElementTree.iterparse(filepath, ('start', 'end'))
     